@@ -0,0 +1,148 @@
+"""
+Measures how fast `mirrortest --mirror '*'` gets through a simulated
+mirror farm (see farm.MirrorFarm) at several --workers values:
+
+	$ python benchmarks/scan.py --mirrors 500 --workers 1 10 50 200 --latency 0.05 --timeouts 0.02
+
+Each run() is done in a fresh process with its own HOME and working directory,
+so that the mirrorlist and Tier0 caches start out empty, peak RSS is that of
+the scan alone and nothing of the real ~/.config/mirrortester is touched.
+"""
+import argparse
+import json
+import os
+import pathlib
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from farm import MirrorFarm
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+def child(options):
+	"""
+	Runs mirrortest.tooling.cli.run() against the farm and prints
+	{"seconds": ..., "max_rss": ...} (max_rss in KiB) as JSON.
+	"""
+	import resource
+
+	argv = ['--mirror', '*', '--workers', str(options.workers), '--processes', str(options.processes), '--engine', options.engine, '--tier0', options.tier0]
+	if options.verify_db:
+		argv.append('--verify-db')
+	if options.deadline:
+		argv += ['--deadline', str(options.deadline)]
+
+	from mirrortest.session import configuration
+	from mirrortest.tooling import cli
+
+	configuration.MIRRORLIST = options.mirrorlist
+	configuration.CON_TIMEOUT = options.timeout
+	if options.per_host is not None:
+		configuration.MAX_PER_HOST = options.per_host
+
+	started = time.perf_counter()
+	cli.run(argv)
+	seconds = time.perf_counter() - started
+
+	# With --processes, the largest of the scanning processes
+	max_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+	print(json.dumps({'seconds': seconds, 'max_rss': max_rss}))
+
+
+def percentile(values, fraction):
+	if not values:
+		return float('nan')
+
+	return statistics.quantiles(values, n=100, method='inclusive')[int(fraction * 100) - 1] if len(values) > 1 else values[0]
+
+
+def measure(farm, workers, options):
+	"""
+	Scans the farm once with `workers` workers and returns a dict of the results
+	"""
+	with tempfile.TemporaryDirectory(prefix='mirrortest-benchmark-') as home:
+		env = {**os.environ, 'HOME': home, 'PYTHONPATH': os.pathsep.join(filter(None, (str(ROOT), os.environ.get('PYTHONPATH'))))}
+		command = [
+			sys.executable, __file__, '--child',
+			'--workers', str(workers),
+			'--engine', options.engine,
+			'--processes', str(options.processes),
+			'--timeout', str(options.timeout),
+			'--tier0', farm.tier0,
+			'--mirrorlist', farm.mirrorlist,
+		]
+		if options.per_host is not None:
+			command += ['--per-host', str(options.per_host)]
+		if options.verify_db:
+			command.append('--verify-db')
+		if options.deadline:
+			command += ['--deadline', str(options.deadline)]
+
+		output = subprocess.run(command, env=env, cwd=home, check=True, capture_output=True, text=True).stdout
+		run = json.loads(output.strip().splitlines()[-1])
+
+		con = sqlite3.connect(os.path.join(home, 'results.db'))
+		probes, failed = con.execute("SELECT COUNT(*), COUNT(*) - SUM(good) FROM probes").fetchone()
+		latencies = [latency for latency, in con.execute("SELECT latency FROM probes WHERE latency IS NOT NULL")]
+		con.close()
+
+	return {
+		'workers': workers,
+		'probes': probes,
+		'failed': failed,
+		'seconds': run['seconds'],
+		'mirrors_per_second': probes / run['seconds'],
+		'p50': percentile(latencies, 0.50),
+		'p99': percentile(latencies, 0.99),
+		'max_rss_mib': run['max_rss'] / 1024,
+	}
+
+
+def main():
+	options = argparse.ArgumentParser(description="Benchmark scanning all mirrors against a local mirror farm.")
+	options.add_argument("--mirrors", type=int, default=200, help="How many mirrors to simulate")
+	options.add_argument("--workers", type=int, nargs="+", default=[1, 10, 50, 200], help="The --workers values to benchmark")
+	options.add_argument("--engine", default="threads", choices=["threads", "async"])
+	options.add_argument("--processes", type=int, default=1, help="Split each scan over this many processes (see --processes of mirrortest)")
+	options.add_argument("--verify-db", default=False, action="store_true")
+	options.add_argument("--latency", type=float, default=0.0, help="Seconds each response is delayed (give or take half of it)")
+	options.add_argument("--timeouts", type=float, default=0.0, help="Fraction of the mirrors that never answer")
+	options.add_argument("--missing", type=float, default=0.0, help="Fraction of the mirrors that answer 404")
+	options.add_argument("--stale", type=float, default=0.0, help="Fraction of the mirrors with an outdated /lastupdate")
+	options.add_argument("--aliases", type=float, default=0.0, help="Fraction of the mirrors listed again under another path of a host that's already listed")
+	options.add_argument("--limit", type=int, default=None, help="Requests in flight a host allows before it drops connections")
+	options.add_argument("--per-host", type=int, default=None, help="MAX_PER_HOST to scan with, 0 for no limit")
+	options.add_argument("--timeout", type=int, default=2, help="CON_TIMEOUT to scan with")
+	options.add_argument("--deadline", type=float, default=None, help="--deadline to scan with")
+	options.add_argument("--json", default=False, action="store_true", help="Print the results as JSON lines")
+	# Used for the run() processes spawned by the benchmark itself
+	options.add_argument("--child", default=False, action="store_true", help=argparse.SUPPRESS)
+	options.add_argument("--tier0", help=argparse.SUPPRESS)
+	options.add_argument("--mirrorlist", help=argparse.SUPPRESS)
+	args = options.parse_args()
+
+	if args.child:
+		args.workers, = args.workers
+		return child(args)
+
+	with MirrorFarm(args.mirrors, args.latency, args.timeouts, args.missing, args.stale, aliases=args.aliases, limit=args.limit) as farm:
+		if not args.json:
+			print(f"{args.mirrors} mirrors, {args.engine} engine, {args.processes} process(es), {args.latency}s latency, {args.timeouts:.0%} timeouts, {args.missing:.0%} missing, {args.stale:.0%} stale, {args.aliases:.0%} aliases, {args.limit or 'no'} limit per host")
+			print(f"{'workers':>8} {'mirrors/s':>10} {'p50':>8} {'p99':>8} {'failed':>7} {'peak RSS':>10}")
+
+		for workers in args.workers:
+			result = measure(farm, workers, args)
+
+			if args.json:
+				print(json.dumps(result))
+			else:
+				print(f"{workers:>8} {result['mirrors_per_second']:>10.1f} {result['p50'] * 1000:>6.1f}ms {result['p99'] * 1000:>6.1f}ms {result['failed']:>7} {result['max_rss_mib']:>7.1f}MiB")
+
+
+if __name__ == '__main__':
+	main()
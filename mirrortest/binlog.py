@@ -0,0 +1,156 @@
+"""
+An append-only binary result log, the compact counterpart of the CSV output_<time>.log.
+
+A log is a directory holding one file per column, each an array of fixed-width
+values in native byte order, so that a column can be mmap'ed and used as is:
+
+	unix_time   d   When the mirror was tested
+	url_id      I   Index into the urls dictionary
+	code        b   The negative result code (see results.ERROR_CODES), 0 when the mirror drifted
+	seconds     d   How far behind the Tier0 the mirror is, NaN for a result code
+	message_id  I   Index into the messages dictionary, NO_MESSAGE when the drift says it all
+
+The urls and messages dictionaries are files of length prefixed UTF-8 strings,
+every distinct string is only written once per log. A row is only complete
+once it's in every column, readers ignore whatever is past the shortest column.
+"""
+import datetime
+import math
+import mmap
+import os
+import struct
+
+COLUMNS = (
+	('unix_time', 'd'),
+	('url_id', 'I'),
+	('code', 'b'),
+	('seconds', 'd'),
+	('message_id', 'I'),
+)
+DICTIONARIES = ('urls', 'messages')
+LENGTH = struct.Struct('<I')
+NO_MESSAGE = 0xFFFFFFFF
+# The last column written, a row is complete once it's in there
+MESSAGE_ID = struct.Struct('=I')
+
+
+def load_strings(path):
+	"""
+	Returns the complete strings of a dictionary file, in order of their id
+	"""
+	strings = []
+	with open(path, 'rb') as fh:
+		data = fh.read()
+
+	offset = 0
+	while offset + LENGTH.size <= len(data):
+		length, = LENGTH.unpack_from(data, offset)
+		if offset + LENGTH.size + length > len(data):  # pragma: no cover
+			break
+
+		strings.append(data[offset + LENGTH.size:offset + LENGTH.size + length].decode('utf-8', errors='replace'))
+		offset += LENGTH.size + length
+
+	return strings
+
+
+def open_column(path, typecode):
+	"""
+	Returns the mmap'ed column file as a memoryview of its values
+	"""
+	with open(path, 'rb') as fh:
+		size = os.fstat(fh.fileno()).st_size
+		if size == 0:
+			return memoryview(b'').cast('B').cast(typecode)
+
+		data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+	# Leaves out a value that's still being written
+	return memoryview(data)[:size - size % struct.calcsize(typecode)].cast(typecode)
+
+
+class BinaryLog:
+	"""
+	Appends results to the binary log in the directory `path`
+	"""
+	def __init__(self, path):
+		os.makedirs(path, exist_ok=True)
+		self.path = path
+		self.formats = {name: struct.Struct(f'={typecode}') for name, typecode in COLUMNS}
+		self.columns = {name: open(os.path.join(path, name), 'ab') for name, typecode in COLUMNS}
+		self.dictionaries = {}
+		self.ids = {}
+
+		for name in DICTIONARIES:
+			self.ids[name] = {value: index for index, value in enumerate(load_strings(os.path.join(path, name)))} if os.path.exists(os.path.join(path, name)) else {}
+			self.dictionaries[name] = open(os.path.join(path, name), 'ab')
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def intern(self, name, value):
+		"""
+		Returns the id of a string in the given dictionary, adding it if it's new
+		"""
+		ids = self.ids[name]
+		if (index := ids.get(value)) is None:
+			encoded = value.encode('utf-8')
+			self.dictionaries[name].write(LENGTH.pack(len(encoded)) + encoded)
+			# Before any row can refer to it
+			self.dictionaries[name].flush()
+			index = ids[value] = len(ids)
+
+		return index
+
+	def write(self, unix_time, url, time_delta_int, time_delta_str):
+		"""
+		Appends the same result that a line of the CSV log holds
+		"""
+		if time_delta_int < 0:
+			code, seconds = int(time_delta_int), math.nan
+		else:
+			code, seconds = 0, time_delta_int
+
+		if isinstance(time_delta_str, datetime.timedelta):
+			message_id = NO_MESSAGE
+		else:
+			message_id = self.intern('messages', str(time_delta_str))
+
+		values = (unix_time, self.intern('urls', url), code, seconds, message_id)
+		for (name, typecode), value in zip(COLUMNS, values):
+			self.columns[name].write(self.formats[name].pack(value))
+			self.columns[name].flush()
+
+	def close(self):
+		for fh in (*self.columns.values(), *self.dictionaries.values()):
+			fh.close()
+
+
+def read(path):
+	"""
+	Returns (columns, urls, messages) of the binary log in the directory `path`,
+	where columns maps each column name to a memoryview of its complete rows.
+	"""
+	columns = {name: open_column(os.path.join(path, name), typecode) for name, typecode in COLUMNS}
+	rows = min(len(column) for column in columns.values())
+
+	return {name: column[:rows] for name, column in columns.items()}, *(load_strings(os.path.join(path, name)) for name in DICTIONARIES)
+
+
+def rows(path, start=0):
+	"""
+	Yields the (unix_time, url, seconds, message) rows of a binary log from row
+	`start` on, the same rows database.parse_rows() returns for a CSV log.
+	"""
+	columns, urls, messages = read(path)
+
+	for unix_time, url_id, code, seconds, message_id in zip(*(column[start:].tolist() for column in columns.values())):
+		if message_id == NO_MESSAGE:
+			message = str(datetime.timedelta(seconds=seconds))
+		else:
+			message = messages[message_id]
+
+		yield unix_time, urls[url_id], code or seconds, message
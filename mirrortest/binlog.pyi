@@ -0,0 +1,39 @@
+import datetime
+import struct
+import typing
+
+COLUMNS :tuple[tuple[str, str], ...]
+DICTIONARIES :tuple[str, ...]
+LENGTH :struct.Struct
+NO_MESSAGE :int
+MESSAGE_ID :struct.Struct
+
+
+def load_strings(path :str) -> list[str]: ...
+
+def open_column(path :str, typecode :str) -> memoryview: ...
+
+
+class BinaryLog:
+	path :str
+	formats :dict[str, struct.Struct]
+	columns :dict[str, typing.BinaryIO]
+	dictionaries :dict[str, typing.BinaryIO]
+	ids :dict[str, dict[str, int]]
+
+	def __init__(self, path :str) -> None: ...
+
+	def __enter__(self) -> 'BinaryLog': ...
+
+	def __exit__(self, *args :typing.Any) -> None: ...
+
+	def intern(self, name :str, value :str) -> int: ...
+
+	def write(self, unix_time :float, url :str, time_delta_int :float, time_delta_str :datetime.timedelta | str) -> None: ...
+
+	def close(self) -> None: ...
+
+
+def read(path :str) -> tuple[dict[str, memoryview], list[str], list[str]]: ...
+
+def rows(path :str, start :int = 0) -> typing.Iterator[tuple[float, str, float, str]]: ...
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import time
+import urllib.error
+
+
+class HTTPCache:
+	"""
+	An on-disk cache of GET responses which remembers the ETag and
+	Last-Modified of each URL. Responses younger than the given TTL are
+	returned without any request, older ones are revalidated with
+	If-None-Match / If-Modified-Since so that unchanged content costs a 304.
+	"""
+	def __init__(self, path):
+		self.path = pathlib.Path(path)
+
+	def _paths(self, url):
+		key = hashlib.sha256(url.encode()).hexdigest()
+		return self.path / f"{key}.json", self.path / f"{key}.body"
+
+	def load(self, url):
+		"""
+		Returns (entry, body) for a cached URL, or (None, None)
+		"""
+		meta_path, body_path = self._paths(url)
+
+		try:
+			with meta_path.open() as fh:
+				entry = json.load(fh)
+			body = body_path.read_bytes()
+		except (OSError, ValueError):
+			return None, None
+
+		if entry.get('url') != url:  # pragma: no cover
+			return None, None
+
+		return entry, body
+
+	def store(self, url, headers, body):
+		meta_path, body_path = self._paths(url)
+		self.path.mkdir(mode=0o770, parents=True, exist_ok=True)
+
+		entry = {
+			'url' : url,
+			'etag' : headers.get('ETag'),
+			'last_modified' : headers.get('Last-Modified'),
+			'fetched' : time.time()
+		}
+
+		# Write to temporary files first, so concurrent readers never see half an entry
+		for path, data in ((body_path, body), (meta_path, json.dumps(entry).encode())):
+			temporary = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+			temporary.write_bytes(data)
+			os.replace(temporary, path)
+
+		return entry
+
+	def request(self, url, timeout, ttl, headers=None):
+		"""
+		Returns the body of `url`, from the cache if it is younger than `ttl`
+		seconds or if the server says it has not been modified since.
+		"""
+		from .connections import pool
+
+		entry, body = self.load(url)
+		if entry and time.time() - entry['fetched'] < ttl:
+			return body
+
+		headers = dict(headers or {})
+		if entry and entry['etag']:
+			headers['If-None-Match'] = entry['etag']
+		if entry and entry['last_modified']:
+			headers['If-Modified-Since'] = entry['last_modified']
+
+		try:
+			response, new_body = pool.request(url, timeout, headers=headers)
+		except urllib.error.HTTPError as error:
+			if error.code != 304 or entry is None:
+				raise
+
+			# Not modified, so the TTL starts over for what we already have
+			self.store(url, {'ETag' : entry['etag'], 'Last-Modified' : entry['last_modified']}, body)
+			return body
+
+		self.store(url, response.headers, new_body)
+		return new_body
+
+	def stream(self, url, timeout, ttl, headers=None):
+		"""
+		Yields the lines of the body of `url` the same way request() returns it, but as they
+		arrive rather than once it's all there. The body is only cached once it has been read
+		to the end, a stream that's abandoned half way keeps whatever was cached before.
+		"""
+		from .connections import pool
+
+		entry, body = self.load(url)
+		if entry and time.time() - entry['fetched'] < ttl:
+			yield from body.splitlines(keepends=True)
+			return
+
+		headers = dict(headers or {})
+		if entry and entry['etag']:
+			headers['If-None-Match'] = entry['etag']
+		if entry and entry['last_modified']:
+			headers['If-Modified-Since'] = entry['last_modified']
+
+		try:
+			with pool.stream(url, timeout, headers=headers) as response:
+				lines = []
+				for line in response:
+					lines.append(line)
+					yield line
+		except urllib.error.HTTPError as error:
+			if error.code != 304 or entry is None:
+				raise
+
+			self.store(url, {'ETag' : entry['etag'], 'Last-Modified' : entry['last_modified']}, body)
+			yield from body.splitlines(keepends=True)
+			return
+
+		self.store(url, response.headers, b''.join(lines))
+
+
+cache = HTTPCache(pathlib.Path('~/.config/mirrortester/cache').expanduser())
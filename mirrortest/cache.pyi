@@ -0,0 +1,23 @@
+import pathlib
+import typing
+
+Entry = dict[str, typing.Any]
+
+
+class HTTPCache:
+	path :pathlib.Path
+
+	def __init__(self, path :pathlib.Path | str) -> None: ...
+
+	def _paths(self, url :str) -> tuple[pathlib.Path, pathlib.Path]: ...
+
+	def load(self, url :str) -> tuple[Entry, bytes] | tuple[None, None]: ...
+
+	def store(self, url :str, headers :typing.Mapping[str, str | None], body :bytes) -> Entry: ...
+
+	def request(self, url :str, timeout :float, ttl :float, headers :typing.Mapping[str, str] | None = None) -> bytes: ...
+
+	def stream(self, url :str, timeout :float, ttl :float, headers :typing.Mapping[str, str] | None = None) -> typing.Iterator[bytes]: ...
+
+
+cache :HTTPCache
@@ -0,0 +1,457 @@
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import http.client
+import io
+import socket
+import ssl
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+# Same limit as urllib.request.HTTPRedirectHandler
+MAX_REDIRECTS = 10
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# How many idle keep-alive connections we keep open in total,
+# the least recently used hosts are closed first.
+MAX_IDLE = 256
+USER_AGENT = f"Python-urllib/{sys.version_info.major}.{sys.version_info.minor}"
+# Upper limit of helper threads running requests for gather(),
+# they are only spawned when there's no idle helper thread to use.
+MAX_HELPERS = 1024
+
+
+# The phases of a request, in seconds, as recorded by trace()
+Timing = collections.namedtuple('Timing', ('url', 'dns', 'connect', 'tls', 'ttfb', 'total'))
+traced = contextvars.ContextVar('traced', default=None)
+# The HedgedCall a request is made for, within hedged()
+hedging = contextvars.ContextVar('hedging', default=None)
+
+
+def connect_timed(connection):
+	"""
+	Does what http.client.HTTPConnection.connect() does, but resolves the
+	host on its own so that the DNS lookup and TCP connect can be timed apart.
+	Returns (dns, connect) in seconds.
+	"""
+	started = time.perf_counter()
+	addresses = socket.getaddrinfo(connection.host, connection.port, type=socket.SOCK_STREAM)
+	resolved = time.perf_counter()
+
+	error = None
+	for family, socket_type, proto, canonname, address in addresses:
+		try:
+			connection.sock = socket.create_connection(address[:2], connection.timeout, connection.source_address)
+			break
+		except OSError as connect_error:
+			error = connect_error
+	else:
+		raise error
+
+	connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+	return resolved - started, time.perf_counter() - resolved
+
+
+class HTTPConnection(http.client.HTTPConnection):
+	"""
+	A HTTPConnection which keeps the (dns, connect, tls) timings of its last connect()
+	"""
+	phases = (0.0, 0.0, 0.0)
+
+	def connect(self):
+		self.phases = (*connect_timed(self), 0.0)
+
+
+class HTTPSConnection(http.client.HTTPSConnection):
+	"""
+	A HTTPSConnection which resumes a previous TLS session with the same host
+	instead of doing a full handshake, and keeps the (dns, connect, tls) timings
+	of its last connect()
+	"""
+	phases = (0.0, 0.0, 0.0)
+
+	def __init__(self, host, port, timeout, context, session=None):
+		super().__init__(host, port, timeout=timeout, context=context)
+		self.context = context
+		self.session = session
+
+	def connect(self):
+		dns, connect = connect_timed(self)
+
+		started = time.perf_counter()
+		self.sock = self.context.wrap_socket(self.sock, server_hostname=self.host, session=self.session)
+
+		self.phases = (dns, connect, time.perf_counter() - started)
+
+
+class Trace(list):
+	"""
+	The Timing of every request made within a trace(). Requests still going in
+	helper threads once it has ended (see gather() and hedged()) no longer add to it.
+	"""
+	ended = False
+
+
+@contextlib.contextmanager
+def trace():
+	"""
+	Collects the Timing of every request made within the block into the yielded
+	list, including the requests gather() runs in its helper threads.
+	"""
+	timings = Trace()
+	token = traced.set(timings)
+
+	try:
+		yield timings
+	finally:
+		timings.ended = True
+		traced.reset(token)
+
+
+def record(timing):
+	if (timings := traced.get()) is None or timings.ended:
+		return
+
+	# The request that lost the race in hedged() is none of the probe's business
+	if (hedge := hedging.get()) is not None and hedge.cancelled:
+		return
+
+	timings.append(timing)
+
+
+class HedgedCall:
+	"""
+	One of the calls of hedged(), keeping the connection its request is on
+	so that it can be hung up on once the other call has won.
+	"""
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.connection = None
+		self.cancelled = False
+
+	def use(self, connection):
+		"""
+		Takes note of the connection the request is on, raising
+		ConnectionAbortedError if the call has been cancelled in the meantime
+		"""
+		with self.lock:
+			if self.cancelled:
+				raise ConnectionAbortedError("The other hedged request was answered first")
+
+			self.connection = connection
+
+	def cancel(self):
+		"""
+		Hangs up on the connection of the request, which wakes it up from
+		waiting on the server and lets it close the connection.
+		"""
+		with self.lock:
+			self.cancelled = True
+
+			if self.connection is not None and self.connection.sock is not None:
+				with contextlib.suppress(OSError):
+					self.connection.sock.shutdown(socket.SHUT_RDWR)
+
+
+def add_phases(phases, connection):
+	"""
+	Adds the (dns, connect, tls) timings of a connection to the `phases` of a
+	request. Only a new connection has phases of its own, a reused one cost
+	nothing to set up.
+	"""
+	phases[:3] = [total + phase for total, phase in zip(phases, connection.phases)]
+	connection.phases = (0.0, 0.0, 0.0)
+
+
+class ConnectionPool:
+	"""
+	Keeps idle keep-alive connections (and TLS sessions) around,
+	keyed by (scheme, host, port), so that all requests towards the
+	same mirror share the same connection instead of reconnecting.
+	"""
+	def __init__(self, max_idle=MAX_IDLE):
+		self.max_idle = max_idle
+		self.lock = threading.Lock()
+		self.idle = collections.OrderedDict()
+		self.idle_count = 0
+		self.sessions = {}
+
+	@functools.cached_property
+	def context(self):
+		# Loading the CA certificates is slow, and not needed at all for plain http://
+		return ssl.create_default_context()
+
+	def _connect(self, key, timeout):
+		scheme, host, port = key
+		if scheme == 'https':
+			with self.lock:
+				session = self.sessions.get(key)
+			return HTTPSConnection(host, port, timeout, self.context, session)
+
+		return HTTPConnection(host, port, timeout=timeout)
+
+	def _acquire(self, key, timeout):
+		"""
+		Returns (connection, reused) with an idle connection
+		if there is one, otherwise a new unconnected one.
+		"""
+		with self.lock:
+			if connections := self.idle.get(key):
+				connection = connections.pop()
+				self.idle_count -= 1
+				if not connections:
+					del self.idle[key]
+
+				connection.timeout = timeout
+				if connection.sock:
+					connection.sock.settimeout(timeout)
+
+				return connection, True
+
+		return self._connect(key, timeout), False
+
+	def _release(self, key, connection):
+		if connection.sock is None:  # pragma: no cover
+			return
+
+		with self.lock:
+			if isinstance(connection.sock, ssl.SSLSocket) and connection.sock.session:
+				self.sessions[key] = connection.sock.session
+
+			self.idle.setdefault(key, []).append(connection)
+			self.idle.move_to_end(key)
+			self.idle_count += 1
+
+			while self.idle_count > self.max_idle:
+				_, connections = self.idle.popitem(last=False)
+				self.idle_count -= len(connections)
+				for idle_connection in connections:
+					idle_connection.close()
+
+	@staticmethod
+	def _send(connection, method, target, headers):
+		# A hedged() request that has already lost doesn't go any further, checked
+		# again once connected as there's no socket to hang up on before that
+		if (hedge := hedging.get()) is not None:
+			hedge.use(connection)
+
+		# Like urllib.request, errors before we have a response are URLError's
+		try:
+			connection.request(method, target, headers=headers)
+		except OSError as error:
+			raise urllib.error.URLError(error)
+
+		if hedge is not None:
+			hedge.use(connection)
+
+		# A server hanging up instead of answering (a rate limited one for instance)
+		# fails the mirror, timeouts are left as they are so they keep their own result code
+		try:
+			return connection.getresponse()
+		except (ConnectionError, http.client.HTTPException) as error:
+			raise urllib.error.URLError(error)
+
+	def _roundtrip(self, key, method, target, headers, timeout, phases):
+		"""
+		Returns (connection, response) with the response body still unread,
+		adding the timings of the connection to `phases` (see add_phases()) either way
+		"""
+		connection, reused = self._acquire(key, timeout)
+
+		try:
+			return connection, self._send(connection, method, target, headers)
+		except urllib.error.URLError:
+			connection.close()
+			if not reused:
+				raise
+		except BaseException:
+			connection.close()
+			raise
+		finally:
+			add_phases(phases, connection)
+
+		# The server has most likely closed the idle connection, retry on a new one
+		connection = self._connect(key, timeout)
+		try:
+			return connection, self._send(connection, method, target, headers)
+		except BaseException:
+			connection.close()
+			raise
+		finally:
+			add_phases(phases, connection)
+
+	def _finish(self, key, connection, response):
+		"""
+		Hands the connection back to the pool if the response
+		was read to the end and the server allows keep-alive.
+		"""
+		if response.isclosed() and not response.will_close:
+			self._release(key, connection)
+		else:
+			connection.close()
+
+	def _read(self, key, connection, response):
+		# A body cut short fails the mirror the same way a server hanging up before its response does
+		try:
+			body = response.read()
+		except (ConnectionError, http.client.HTTPException) as error:
+			connection.close()
+			raise urllib.error.URLError(error)
+		except BaseException:
+			connection.close()
+			raise
+
+		self._finish(key, connection, response)
+		return body
+
+	def _open(self, url, timeout, headers, method, phases):
+		"""
+		Follows any redirects and returns (key, connection, response) of
+		the final successful response, with its body still unread.
+		Errors are raised the same way urllib.request.urlopen() would raise them.
+
+		The [dns, connect, tls, ttfb] list `phases` gets the timings of all hops up
+		until the headers of the response arrived, or as far as they got if it fails.
+		"""
+		started = time.perf_counter()
+
+		# Header names are capitalized the same way urllib.request.Request does it
+		headers = {'User-agent': USER_AGENT, **{key.capitalize(): value for key, value in (headers or {}).items()}}
+
+		for redirect in range(MAX_REDIRECTS + 1):
+			parsed = urllib.parse.urlsplit(url)
+			key = (parsed.scheme, parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80))
+
+			target = parsed.path or '/'
+			if parsed.query:
+				target += f"?{parsed.query}"
+
+			connection, response = self._roundtrip(key, method, target, headers, timeout, phases)
+			phases[3] = time.perf_counter() - started
+
+			if response.status in REDIRECT_CODES and (location := response.headers.get('Location')):
+				self._read(key, connection, response)
+
+				redirect_url = urllib.parse.urljoin(url, location)
+				if urllib.parse.urlsplit(redirect_url).hostname != parsed.hostname:
+					headers.pop('Authorization', None)
+
+				url = redirect_url
+				continue
+
+			if not 200 <= response.status < 300:
+				body = self._read(key, connection, response)
+				raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(body))
+
+			return key, connection, response
+
+		raise urllib.error.HTTPError(url, response.status, 'The HTTP server returned a redirect error that would lead to an infinite loop.', response.headers, None)
+
+	def request(self, url, timeout, headers=None, method='GET'):
+		"""
+		Performs a request over a pooled connection, following redirects,
+		and returns (response, body).
+		"""
+		started = time.perf_counter()
+		phases = [0.0, 0.0, 0.0, 0.0]
+
+		try:
+			key, connection, response = self._open(url, timeout, headers, method, phases)
+			return response, self._read(key, connection, response)
+		finally:
+			# A failed request is recorded as well, with the phases it got through
+			record(Timing(url, *phases, time.perf_counter() - started))
+
+	@contextlib.contextmanager
+	def stream(self, url, timeout, headers=None, method='GET'):
+		"""
+		Like request(), but yields the response before its body has been read
+		so that it can be consumed with response.read(size) in chunks.
+		"""
+		started = time.perf_counter()
+		phases = [0.0, 0.0, 0.0, 0.0]
+
+		try:
+			key, connection, response = self._open(url, timeout, headers, method, phases)
+
+			try:
+				yield response
+			except (ConnectionError, http.client.HTTPException) as error:
+				connection.close()
+				raise urllib.error.URLError(error)
+			except BaseException:
+				connection.close()
+				raise
+
+			self._finish(key, connection, response)
+		finally:
+			# A failed request is recorded as well, with the phases it got through
+			record(Timing(url, *phases, time.perf_counter() - started))
+
+	def close(self):
+		with self.lock:
+			for connections in self.idle.values():
+				for connection in connections:
+					connection.close()
+
+			self.idle.clear()
+			self.idle_count = 0
+
+
+def gather(*calls, timeout):
+	"""
+	Runs the given (request) callables at the same time, the first one in
+	the calling thread and the rest in helper threads, and returns their results.
+	All calls share one deadline of `timeout` seconds, past which TimeoutError is raised.
+	"""
+	deadline = time.monotonic() + timeout
+	# Copying the context lets the helper threads record into the same trace()
+	pending = [helpers.submit(contextvars.copy_context().run, call) for call in calls[1:]]
+
+	results = [calls[0]()]
+	for future in pending:
+		try:
+			results.append(future.result(timeout=max(deadline - time.monotonic(), 0)))
+		except concurrent.futures.TimeoutError:
+			raise TimeoutError('The read operation timed out')
+
+	return results
+
+
+def hedged(call, delay):
+	"""
+	Runs the (request) callable in a helper thread and, if it hasn't returned
+	within `delay` seconds, runs it a second time next to it on another connection.
+	Returns (or raises) what whichever of the two is done first does, the other
+	one is hung up on (see HedgedCall) and its request isn't recorded.
+	"""
+	calls = {}
+
+	def _submit():
+		hedge = HedgedCall()
+		context = contextvars.copy_context()
+		context.run(hedging.set, hedge)
+		calls[helpers.submit(context.run, call)] = hedge
+
+	_submit()
+	done, _ = concurrent.futures.wait(calls, timeout=delay)
+	if not done:
+		_submit()
+		done, _ = concurrent.futures.wait(calls, return_when=concurrent.futures.FIRST_COMPLETED)
+
+	winner = done.pop()
+	for future, hedge in calls.items():
+		if future is not winner:
+			hedge.cancel()
+
+	return winner.result()
+
+
+# The pool shared by all models
+pool = ConnectionPool()
+helpers = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_HELPERS, thread_name_prefix='mirrortest-request')
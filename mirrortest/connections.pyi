@@ -0,0 +1,117 @@
+import collections
+import concurrent.futures
+import contextvars
+import http.client
+import ssl
+import threading
+import typing
+
+MAX_REDIRECTS :int
+REDIRECT_CODES :tuple[int, ...]
+MAX_IDLE :int
+USER_AGENT :str
+MAX_HELPERS :int
+
+Key = tuple[str, str, int]
+
+
+class Timing(typing.NamedTuple):
+	url :str
+	dns :float
+	connect :float
+	tls :float
+	ttfb :float
+	total :float
+
+traced :contextvars.ContextVar[Trace | None]
+hedging :contextvars.ContextVar[HedgedCall | None]
+
+
+def connect_timed(connection :http.client.HTTPConnection) -> tuple[float, float]: ...
+
+
+class HTTPConnection(http.client.HTTPConnection):
+	phases :tuple[float, float, float]
+
+	def connect(self) -> None: ...
+
+
+class HTTPSConnection(http.client.HTTPSConnection):
+	phases :tuple[float, float, float]
+	context :ssl.SSLContext
+	session :ssl.SSLSession | None
+
+	def __init__(self, host :str, port :int, timeout :float, context :ssl.SSLContext, session :ssl.SSLSession | None = None) -> None: ...
+
+	def connect(self) -> None: ...
+
+
+class Trace(list[Timing]):
+	ended :bool
+
+
+def trace() -> typing.ContextManager[Trace]: ...
+
+def record(timing :Timing) -> None: ...
+
+
+class HedgedCall:
+	lock :threading.Lock
+	connection :http.client.HTTPConnection | None
+	cancelled :bool
+
+	def __init__(self) -> None: ...
+
+	def use(self, connection :http.client.HTTPConnection) -> None: ...
+
+	def cancel(self) -> None: ...
+
+
+def add_phases(phases :list[float], connection :HTTPConnection | HTTPSConnection) -> None: ...
+
+
+class ConnectionPool:
+	max_idle :int
+	lock :threading.Lock
+	idle :collections.OrderedDict[Key, list[HTTPConnection | HTTPSConnection]]
+	idle_count :int
+	sessions :dict[Key, ssl.SSLSession]
+
+	@property
+	def context(self) -> ssl.SSLContext: ...
+
+	def __init__(self, max_idle :int = MAX_IDLE) -> None: ...
+
+	def _connect(self, key :Key, timeout :float) -> HTTPConnection | HTTPSConnection: ...
+
+	def _acquire(self, key :Key, timeout :float) -> tuple[HTTPConnection | HTTPSConnection, bool]: ...
+
+	def _release(self, key :Key, connection :http.client.HTTPConnection) -> None: ...
+
+	@staticmethod
+	def _send(connection :http.client.HTTPConnection, method :str, target :str, headers :typing.Mapping[str, str]) -> http.client.HTTPResponse: ...
+
+	def _roundtrip(self, key :Key, method :str, target :str, headers :typing.Mapping[str, str], timeout :float, phases :list[float]) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]: ...
+
+	def _finish(self, key :Key, connection :http.client.HTTPConnection, response :http.client.HTTPResponse) -> None: ...
+
+	def _read(self, key :Key, connection :http.client.HTTPConnection, response :http.client.HTTPResponse) -> bytes: ...
+
+	def _open(self, url :str, timeout :float, headers :typing.Mapping[str, str] | None, method :str, phases :list[float]) -> tuple[Key, http.client.HTTPConnection, http.client.HTTPResponse]: ...
+
+	def request(self, url :str, timeout :float, headers :typing.Mapping[str, str] | None = None, method :str = 'GET') -> tuple[http.client.HTTPResponse, bytes]: ...
+
+	def stream(self, url :str, timeout :float, headers :typing.Mapping[str, str] | None = None, method :str = 'GET') -> typing.ContextManager[http.client.HTTPResponse]: ...
+
+	def close(self) -> None: ...
+
+
+T = typing.TypeVar('T')
+
+def gather(*calls :typing.Callable[[], T], timeout :float) -> list[T]: ...
+
+def hedged(call :typing.Callable[[], T], delay :float) -> T: ...
+
+
+pool :ConnectionPool
+helpers :concurrent.futures.ThreadPoolExecutor
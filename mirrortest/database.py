@@ -0,0 +1,614 @@
+import collections
+import csv
+import io
+import os
+import queue
+import sqlite3
+import struct
+import threading
+import time
+import urllib.parse
+
+SCHEMA = (
+	"""
+	CREATE TABLE IF NOT EXISTS results(
+		id INTEGER PRIMARY KEY AUTOINCREMENT,
+		unix_time UNIXEPOCH,
+		url VARCHAR(255),
+		seconds INT,
+		message VARCHAR(255),
+		UNIQUE(unix_time, url)
+	)""",
+	# How far into each log file --parse has read so far
+	"""
+	CREATE TABLE IF NOT EXISTS ingest_state(
+		path VARCHAR(255) PRIMARY KEY,
+		size INT,
+		mtime REAL,
+		offset INT
+	)""",
+	# UNIQUE(unix_time, url) already gives us a covering index for range scans
+	# over unix_time, this one is for looking up the rows of a single mirror.
+	"""
+	CREATE INDEX IF NOT EXISTS results_url_time ON results(url, unix_time)""",
+	# Every probe, good or bad, is kept in probes. The mirror URLs and request
+	# paths are stored once each and referred to by id, and the timings of all
+	# requests of a probe are packed into one blob (see pack_timings()).
+	"""
+	CREATE TABLE IF NOT EXISTS urls(
+		id INTEGER PRIMARY KEY,
+		url VARCHAR(255) UNIQUE
+	)""",
+	"""
+	CREATE TABLE IF NOT EXISTS paths(
+		id INTEGER PRIMARY KEY,
+		path VARCHAR(255) UNIQUE
+	)""",
+	"""
+	CREATE TABLE IF NOT EXISTS probes(
+		unix_time REAL,
+		url_id INT,
+		good INT,
+		seconds REAL,
+		latency REAL,
+		timings BLOB
+	)""",
+	# Also keeps --merge from adding the same probe twice
+	"""
+	CREATE UNIQUE INDEX IF NOT EXISTS probes_url_time ON probes(url_id, unix_time)""",
+	"""
+	CREATE INDEX IF NOT EXISTS probes_time ON probes(unix_time)""",
+	# Per mirror and (UTC) day, how many results it had of each code: the negative
+	# result codes, or 0 for drifting too far behind, with the drift of the latter
+	# (the seconds are NULL for the other codes). See rollup().
+	"""
+	CREATE TABLE IF NOT EXISTS daily(
+		day INT,
+		url VARCHAR(255),
+		code INT,
+		hits INT,
+		min_seconds REAL,
+		max_seconds REAL,
+		sum_seconds REAL,
+		PRIMARY KEY(day, url, code)
+	)""",
+	# The id of the last result folded into daily
+	"""
+	CREATE TABLE IF NOT EXISTS daily_state(
+		results_id INT
+	)""",
+)
+# Mirrors with at least this many errors within the --stats window are listed
+ERRONEOUS_HITS = 3
+# Each host gets TIMEOUT_FACTOR times the TIMEOUT_PERCENTILE of the latencies of its good probes over
+# the last TIMEOUT_DAYS plus TIMEOUT_MARGIN seconds as its timeout, once it has TIMEOUT_SAMPLES of them.
+# Only the last TIMEOUT_PROBES probes of each mirror are taken into account.
+TIMEOUT_DAYS = 7
+TIMEOUT_SAMPLES = 5
+TIMEOUT_PROBES = 100
+TIMEOUT_PERCENTILE = 0.95
+TIMEOUT_FACTOR = 2
+TIMEOUT_MARGIN = 1.0
+# The mirrors on a host where the last BREAKER_STREAK or more probes within BREAKER_DAYS of a mirror all
+# failed to connect or timed out are only rechecked (see records.MirrorRecord.recheck()) once BREAKER_INTERVAL_MIN
+# seconds have passed since its last probe, doubling for every further failure up to BREAKER_INTERVAL_MAX.
+BREAKER_DAYS = 30
+BREAKER_STREAK = 5
+BREAKER_CODES = (-2, -3)
+BREAKER_INTERVAL_MIN = 3600
+BREAKER_INTERVAL_MAX = 86400
+# What breaker() tells to do with a mirror that has been down for a while
+SKIP = 'skip'
+RECHECK = 'recheck'
+# A ResultSink commits whichever comes first, this many rows or this many seconds after the first row
+BATCH_ROWS = 500
+BATCH_SECONDS = 2.0
+# How long to wait for another connection (another scan, or --stats) to let go of the write lock
+BUSY_SECONDS = 60.0
+
+INSERT_RESULTS = """
+	INSERT INTO results (
+		unix_time, url, seconds, message
+	) VALUES (
+		?, ?, ?, ?
+	) ON CONFLICT DO NOTHING
+"""
+INSERT_PROBES = """
+	INSERT INTO probes (
+		unix_time, url_id, good, seconds, latency, timings
+	) VALUES (
+		?, ?, ?, ?, ?, ?
+	) ON CONFLICT DO NOTHING
+"""
+# path id, dns, connect, tls, ttfb and total seconds of one request
+TIMING = struct.Struct('<I5f')
+
+
+def connect(path='results.db'):
+	"""
+	Opens (and creates if needed) the result database in WAL mode,
+	so that readers are not blocked while results are being written.
+	"""
+	con = sqlite3.connect(path, timeout=BUSY_SECONDS)
+	con.execute('PRAGMA journal_mode=WAL')
+	con.execute('PRAGMA synchronous=NORMAL')
+
+	for statement in SCHEMA:
+		con.execute(statement)
+
+	return con
+
+
+def rollup(con):
+	"""
+	Folds the results added since the last rollup into the daily table,
+	grouped together, which costs far less than keeping it up to date row by row.
+	Every result is added with an increasing id, so only those past the
+	last id folded in are read.
+
+	Returns the number of results folded in.
+	"""
+	with con:
+		# Taking the write lock first keeps another process from folding in the same results
+		con.execute("BEGIN IMMEDIATE")
+
+		last, = con.execute("SELECT COALESCE(MAX(results_id), 0) FROM daily_state").fetchone()
+		newest, count = con.execute("SELECT MAX(id), COUNT(*) FROM results WHERE id > ?", (last,)).fetchone()
+		if not count:
+			return 0
+
+		# The WHERE is needed for SQLite to tell the ON CONFLICT apart from a join constraint
+		con.execute("""
+			INSERT INTO daily (
+				day, url, code, hits, min_seconds, max_seconds, sum_seconds
+			) SELECT
+				CAST(unix_time / 86400 AS INT) AS day,
+				url,
+				MIN(seconds, 0) AS code,
+				COUNT(*),
+				MIN(IIF(seconds >= 0, seconds, NULL)),
+				MAX(IIF(seconds >= 0, seconds, NULL)),
+				SUM(IIF(seconds >= 0, seconds, NULL))
+			FROM results
+			WHERE id > ? AND id <= ?
+			GROUP BY day, url, code
+			ON CONFLICT(day, url, code) DO UPDATE SET
+				hits = hits + excluded.hits,
+				min_seconds = MIN(min_seconds, excluded.min_seconds),
+				max_seconds = MAX(max_seconds, excluded.max_seconds),
+				sum_seconds = sum_seconds + excluded.sum_seconds
+		""", (last, newest))
+
+		con.execute("DELETE FROM daily_state")
+		con.execute("INSERT INTO daily_state (results_id) VALUES (?)", (newest,))
+
+	return count
+
+
+def parse_rows(text):
+	"""
+	Yields the (unix_time, url, seconds, message) rows of a CSV result log,
+	skipping anything that doesn't have exactly four columns.
+	"""
+	for row in csv.reader(io.StringIO(text, newline=''), delimiter=',', quotechar='"'):
+		try:
+			unix_timestamp, url, seconds, message = row
+		except ValueError as err:
+			if str(err).startswith('too many values to unpack') or str(err).startswith('not enough values to unpack'):
+				continue
+			else:  # pragma: no cover
+				raise err
+
+		yield unix_timestamp, url, seconds, message
+
+
+def ingest(con, paths):
+	"""
+	Inserts the rows of the given CSV logs and binary logs (directories,
+	see binlog.py) into the result database. Only what was added to a log
+	since the last ingest is read, and all rows are inserted in batches
+	within a single transaction.
+
+	Returns the number of rows read.
+	"""
+	rows_read = 0
+
+	with con:
+		for path in paths:
+			path = os.path.realpath(path)
+			binary = os.path.isdir(path)
+			# A binary log has grown once its last column has, which is written after the others
+			stat = os.stat(os.path.join(path, 'message_id') if binary else path)
+
+			offset = 0
+			if state := con.execute("SELECT size, mtime, offset FROM ingest_state WHERE path = ?", (path,)).fetchone():
+				size, mtime, offset = state
+				if size == stat.st_size and mtime == stat.st_mtime:
+					continue
+
+				# The log has been truncated or replaced, start over
+				if stat.st_size < offset:
+					offset = 0
+
+			if binary:
+				from . import binlog
+
+				# Only complete rows are read, so the offset is in whole message_id values
+				rows = list(binlog.rows(path, offset // binlog.MESSAGE_ID.size))
+				read = len(rows) * binlog.MESSAGE_ID.size
+			else:
+				with open(path, 'rb') as fh:
+					fh.seek(offset)
+					data = fh.read()
+
+				# Only consume complete lines, a scan might still be writing the last one
+				data = data[:data.rfind(b'\n') + 1]
+				rows = list(parse_rows(data.decode('utf-8', errors='replace')))
+				read = len(data)
+
+			con.executemany(INSERT_RESULTS, rows)
+
+			con.execute("""
+				INSERT INTO ingest_state (
+					path, size, mtime, offset
+				) VALUES (
+					?, ?, ?, ?
+				) ON CONFLICT(path) DO UPDATE SET
+					size = excluded.size,
+					mtime = excluded.mtime,
+					offset = excluded.offset
+			""", (path, stat.st_size, stat.st_mtime, offset + read))
+
+			rows_read += len(rows)
+
+	rollup(con)
+
+	# Keeps the query planner statistics fresh, so --stats picks the right index
+	con.execute('PRAGMA optimize')
+
+	return rows_read
+
+
+def intern(con, table, value, ids):
+	"""
+	Returns the id of `value` in one of the urls or paths tables,
+	adding it if needed. `ids` is a dict caching the ids already known.
+	"""
+	if (value_id := ids.get(value)) is None:
+		column = table[:-1]
+		con.execute(f"INSERT INTO main.{table} ({column}) VALUES (?) ON CONFLICT DO NOTHING", (value,))
+		value_id = ids[value] = con.execute(f"SELECT id FROM main.{table} WHERE {column} = ?", (value,)).fetchone()[0]
+
+	return value_id
+
+
+def pack_timings(con, url, timings, path_ids):
+	"""
+	Packs the connections.Timing of each request made towards `url` into
+	one TIMING record per request, and returns (latency, blob) where latency
+	is the total time of the slowest request. Requests made towards other hosts
+	while probing the mirror (the Tier0 for instance) are left out.
+	"""
+	blob = b''
+	latency = None
+
+	for timing in timings:
+		if not timing.url.startswith(url):
+			continue
+
+		path_id = intern(con, 'paths', timing.url[len(url):] or '/', path_ids)
+		blob += TIMING.pack(path_id, timing.dns, timing.connect, timing.tls, timing.ttfb, timing.total)
+		latency = max(latency or 0.0, timing.total)
+
+	return latency, blob
+
+
+def unpack_timings(con, blob):
+	"""
+	Returns the (path, dns, connect, tls, ttfb, total) timings of each request in a probes.timings blob
+	"""
+	paths = dict(con.execute("SELECT id, path FROM paths"))
+
+	return [(paths[path_id], *phases) for path_id, *phases in TIMING.iter_unpack(blob)]
+
+
+def merge(con, paths):
+	"""
+	Adds the results and probes of other result databases (from --shard's
+	scanned elsewhere for instance) that aren't in this one yet.
+	The url and path ids of the probes are translated to the ones used here.
+
+	Returns the number of rows added.
+	"""
+	url_ids = {}
+	path_ids = {}
+	added = 0
+
+	for path in paths:
+		con.execute("ATTACH DATABASE ? AS shard", (path,))
+
+		with con:
+			# The WHERE is needed for SQLite to tell the ON CONFLICT apart from a join constraint
+			added += con.execute("""
+				INSERT INTO main.results (
+					unix_time, url, seconds, message
+				) SELECT unix_time, url, seconds, message FROM shard.results WHERE true
+				ON CONFLICT DO NOTHING
+			""").rowcount
+
+			shard_paths = dict(con.execute("SELECT id, path FROM shard.paths"))
+			probes = []
+			for unix_time, url, good, seconds, latency, blob in con.execute("""
+				SELECT probes.unix_time, urls.url, probes.good, probes.seconds, probes.latency, probes.timings
+				FROM shard.probes AS probes
+				JOIN shard.urls AS urls ON urls.id = probes.url_id
+			""").fetchall():
+				blob = b''.join(TIMING.pack(intern(con, 'paths', shard_paths[path_id], path_ids), *phases) for path_id, *phases in TIMING.iter_unpack(blob))
+				probes.append((unix_time, intern(con, 'urls', url, url_ids), good, seconds, latency, blob))
+
+			added += con.executemany(INSERT_PROBES, probes).rowcount
+
+		con.execute("DETACH DATABASE shard")
+
+	rollup(con)
+
+	return added
+
+
+class ResultSink(threading.Thread):
+	"""
+	Writes (unix_time, url, seconds, message) results and
+	(unix_time, url, good_exit, seconds, timings) probes straight into
+	the result database from a single thread while a scan is running,
+	committing them in batches of BATCH_ROWS rows or BATCH_SECONDS seconds
+	and rolling up each batch of results into the daily table.
+	An error writing them is raised by close().
+	"""
+	def __init__(self, path='results.db', batch_rows=BATCH_ROWS, batch_seconds=BATCH_SECONDS):
+		threading.Thread.__init__(self, daemon=True)
+
+		self.path = path
+		self.batch_rows = batch_rows
+		self.batch_seconds = batch_seconds
+		self.rows = queue.SimpleQueue()
+		self.error = None
+		self.start()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def put(self, row):
+		self.rows.put(('results', row))
+
+	def probe(self, row):
+		self.rows.put(('probes', row))
+
+	def close(self):
+		self.rows.put(None)
+		self.join()
+
+		if self.error:
+			raise self.error
+
+	def run(self):
+		try:
+			self.write()
+		except Exception as error:
+			self.error = error
+
+	def write(self):
+		# sqlite3 connections may only be used by the thread that created them
+		con = connect(self.path)
+		url_ids = {}
+		path_ids = {}
+		batch = {'results': [], 'probes': []}
+		batched = 0
+		commit_at = None
+		running = True
+
+		while running:
+			try:
+				item = self.rows.get(timeout=None if commit_at is None else max(commit_at - time.monotonic(), 0))
+			except queue.Empty:
+				item = False
+
+			if item is None:
+				running = False
+			elif item:
+				table, row = item
+				batch[table].append(row)
+				batched += 1
+				if commit_at is None:
+					commit_at = time.monotonic() + self.batch_seconds
+
+			if batched and (not running or batched >= self.batch_rows or time.monotonic() >= commit_at):
+				with con:
+					con.executemany(INSERT_RESULTS, batch['results'])
+
+					probes = []
+					for unix_time, url, good_exit, seconds, timings in batch['probes']:
+						latency, blob = pack_timings(con, url, timings, path_ids)
+						probes.append((unix_time, intern(con, 'urls', url, url_ids), int(bool(good_exit)), seconds, latency, blob))
+					con.executemany(INSERT_PROBES, probes)
+
+				if batch['results']:
+					rollup(con)
+
+				batch = {'results': [], 'probes': []}
+				batched = 0
+				commit_at = None
+
+		con.close()
+
+
+def proof(con, url, since, until=None):
+	"""
+	Returns a cursor of (message,) for the errors of a mirror since the unix time `since`
+	(and before `until`)
+	"""
+	return con.execute("SELECT message FROM results WHERE url = ? AND unix_time >= ? AND unix_time < ? ORDER BY unix_time", (url, since, until or float('inf')))
+
+
+def reliability(con, since, until, hits=ERRONEOUS_HITS):
+	"""
+	Returns a cursor of (url, hits, oldest, newest) from the daily rollups (see rollup()) for every
+	mirror with at least `hits` errors from day `since` up until and including day `until`,
+	where days are unix days (unix time // 86400) and so are oldest and newest.
+	"""
+	return con.execute("""
+		SELECT url, SUM(hits), MIN(day), MAX(day)
+		FROM daily
+		WHERE day BETWEEN ? AND ?
+		GROUP BY url
+		HAVING SUM(hits) >= ?
+		ORDER BY url
+	""", (since, until, hits))
+
+
+def breakdown(con, url, since, until):
+	"""
+	Returns a cursor of (code, hits, min_seconds, avg_seconds, max_seconds) of a mirror
+	from the daily rollups of days `since` up until and including `until`, the seconds
+	being the drift of the code 0 results and None for the others.
+	"""
+	return con.execute("""
+		SELECT code, SUM(hits), MIN(min_seconds), SUM(sum_seconds) / SUM(hits), MAX(max_seconds)
+		FROM daily
+		WHERE url = ? AND day BETWEEN ? AND ?
+		GROUP BY code
+		ORDER BY code DESC
+	""", (url, since, until))
+
+
+def ranking(con, since):
+	"""
+	Returns a cursor of (url, probes, latency, seconds) for every mirror with
+	good probes since the unix time `since`, fastest first. latency is the
+	average time of the slowest request of each probe, and seconds the
+	average drift behind the Tier0.
+	"""
+	return con.execute("""
+		SELECT urls.url, COUNT(*), AVG(probes.latency), AVG(probes.seconds)
+		FROM probes
+		JOIN urls ON urls.id = probes.url_id
+		WHERE probes.unix_time >= ? AND probes.good = 1
+		GROUP BY probes.url_id
+		ORDER BY AVG(probes.latency), AVG(probes.seconds)
+	""", (since,))
+
+
+def percentiles(con, since, fraction=TIMEOUT_PERCENTILE, limit=TIMEOUT_PROBES, path='/lastsync'):
+	"""
+	Returns ({hostname: latency}, {hostname: total}) with the `fraction` percentile of the latencies
+	of the good probes since the unix time `since`, the last `limit` of them for each mirror, and of
+	the total time of their requests for `path`. A failed probe would teach a host that keeps timing
+	out its own timeout. Hosts with too few probes are left out.
+	"""
+	path_id, = con.execute("SELECT id FROM paths WHERE path = ?", (path,)).fetchone() or (None,)
+
+	latencies = collections.defaultdict(list)
+	totals = collections.defaultdict(list)
+	hosts = {}
+	for url, latency, blob in con.execute("""
+		SELECT urls.url, recent.latency, recent.timings
+		FROM (
+			SELECT url_id, latency, timings, ROW_NUMBER() OVER (PARTITION BY url_id ORDER BY unix_time DESC) AS age
+			FROM probes
+			WHERE unix_time >= ? AND good = 1 AND latency IS NOT NULL
+		) AS recent
+		JOIN urls ON urls.id = recent.url_id
+		WHERE recent.age <= ?
+	""", (since, limit)):
+		if (host := hosts.get(url)) is None:
+			host = hosts[url] = urllib.parse.urlsplit(url).hostname
+		latencies[host].append(latency)
+		totals[host].extend(total for timing_path, dns, connect, tls, ttfb, total in TIMING.iter_unpack(blob) if timing_path == path_id)
+
+	return percentile(latencies, fraction), percentile(totals, fraction)
+
+
+def percentile(samples, fraction):
+	"""
+	Returns {hostname: value} with the `fraction` percentile of the {hostname: [value]} `samples`
+	of each host that has at least TIMEOUT_SAMPLES of them
+	"""
+	learned = {}
+	for host, values in samples.items():
+		if len(values) < TIMEOUT_SAMPLES:
+			continue
+
+		values.sort()
+		learned[host] = values[min(int(len(values) * fraction), len(values) - 1)]
+
+	return learned
+
+
+def timeouts(percentiles, minimum, maximum):
+	"""
+	Returns {hostname: timeout} with a timeout learned from the latency `percentiles`
+	of each host (the first of percentiles()), clamped between `minimum` and `maximum`.
+	"""
+	return {host: min(max(percentile * TIMEOUT_FACTOR + TIMEOUT_MARGIN, minimum), maximum) for host, percentile in percentiles.items()}
+
+
+def host_timeout(timeouts, url):
+	"""
+	Returns the learned timeout (or hedge delay) for the host of `url`, or None
+	"""
+	return (timeouts or {}).get(urllib.parse.urlsplit(url).hostname)
+
+
+def breakers(con, since, streak=BREAKER_STREAK):
+	"""
+	Returns {hostname: (failures, last)} for every host whose mirrors probed since the unix time
+	`since` have all failed with one of the BREAKER_CODES at least `streak` times in a row up until
+	now. failures is the shortest of those streaks and last the unix time of the most recent failure.
+	"""
+	codes = ', '.join(str(code) for code in BREAKER_CODES)
+
+	# The last probe of each mirror that didn't fail that way, looked up once rather than for every probe
+	hosts = {}
+	for url, failures, last in con.execute(f"""
+		WITH passed AS (
+			SELECT url_id, MAX(unix_time) AS unix_time
+			FROM probes
+			WHERE unix_time >= ? AND NOT (good = 0 AND seconds IN ({codes}))
+			GROUP BY url_id
+		)
+		SELECT urls.url, COUNT(*) FILTER (WHERE probes.unix_time > COALESCE(passed.unix_time, 0)), MAX(probes.unix_time)
+		FROM probes
+		JOIN urls ON urls.id = probes.url_id
+		LEFT JOIN passed ON passed.url_id = probes.url_id
+		WHERE probes.unix_time >= ?
+		GROUP BY probes.url_id
+	""", (since, since)):
+		hosts.setdefault(urllib.parse.urlsplit(url).hostname, []).append((failures, last) if failures >= streak else None)
+
+	# A host listed more than once is only down while none of its mirrors answer
+	return {
+		host: (min(failures for failures, last in states), max(last for failures, last in states))
+		for host, states in hosts.items()
+		if None not in states
+	}
+
+
+def breaker_due(failures, last, streak=BREAKER_STREAK):
+	"""
+	Returns the unix time a mirror that failed `failures` times in a row,
+	the last time at `last`, is due to be rechecked
+	"""
+	return last + min(BREAKER_INTERVAL_MIN * 2 ** (failures - streak), BREAKER_INTERVAL_MAX)
+
+
+def breaker(breakers, url, now):
+	"""
+	Returns None for a mirror to be tested as usual, RECHECK for one on a host (see breakers())
+	that has been down for a while and is due to be rechecked and SKIP for one that is not due yet.
+	"""
+	if (state := (breakers or {}).get(urllib.parse.urlsplit(url).hostname)) is None:
+		return None
+
+	return RECHECK if now >= breaker_due(*state) else SKIP
@@ -0,0 +1,94 @@
+import queue
+import sqlite3
+import struct
+import threading
+import typing
+
+from .connections import Timing
+
+SCHEMA :tuple[str, ...]
+ERRONEOUS_HITS :int
+TIMEOUT_DAYS :int
+TIMEOUT_SAMPLES :int
+TIMEOUT_PROBES :int
+TIMEOUT_PERCENTILE :float
+TIMEOUT_FACTOR :float
+TIMEOUT_MARGIN :float
+BREAKER_DAYS :int
+BREAKER_STREAK :int
+BREAKER_CODES :tuple[int, ...]
+BREAKER_INTERVAL_MIN :float
+BREAKER_INTERVAL_MAX :float
+SKIP :str
+RECHECK :str
+BATCH_ROWS :int
+BATCH_SECONDS :float
+BUSY_SECONDS :float
+INSERT_RESULTS :str
+INSERT_PROBES :str
+TIMING :struct.Struct
+
+Row = tuple[str, str, str, str]
+Probe = tuple[float, str, bool | None, float | None, list[Timing]]
+
+
+def connect(path :str = 'results.db') -> sqlite3.Connection: ...
+
+def rollup(con :sqlite3.Connection) -> int: ...
+
+def parse_rows(text :str) -> typing.Iterator[Row]: ...
+
+def ingest(con :sqlite3.Connection, paths :typing.Iterable[str]) -> int: ...
+
+def intern(con :sqlite3.Connection, table :str, value :str, ids :dict[str, int]) -> int: ...
+
+def pack_timings(con :sqlite3.Connection, url :str, timings :typing.Iterable[Timing], path_ids :dict[str, int]) -> tuple[float | None, bytes]: ...
+
+def unpack_timings(con :sqlite3.Connection, blob :bytes) -> list[tuple[str, float, float, float, float, float]]: ...
+
+def merge(con :sqlite3.Connection, paths :typing.Iterable[str]) -> int: ...
+
+class ResultSink(threading.Thread):
+	path :str
+	batch_rows :int
+	batch_seconds :float
+	rows :queue.SimpleQueue[tuple[str, tuple[float, str, float, str] | Probe] | None]
+	error :Exception | None
+
+	def __init__(self, path :str = 'results.db', batch_rows :int = BATCH_ROWS, batch_seconds :float = BATCH_SECONDS) -> None: ...
+
+	def __enter__(self) -> 'ResultSink': ...
+
+	def __exit__(self, *args :typing.Any) -> None: ...
+
+	def put(self, row :tuple[float, str, float, str]) -> None: ...
+
+	def probe(self, row :Probe) -> None: ...
+
+	def close(self) -> None: ...
+
+	def run(self) -> None: ...
+
+	def write(self) -> None: ...
+
+def proof(con :sqlite3.Connection, url :str, since :float, until :float | None = None) -> sqlite3.Cursor: ...
+
+def reliability(con :sqlite3.Connection, since :int, until :int, hits :int = ERRONEOUS_HITS) -> sqlite3.Cursor: ...
+
+def breakdown(con :sqlite3.Connection, url :str, since :int, until :int) -> sqlite3.Cursor: ...
+
+def ranking(con :sqlite3.Connection, since :float) -> sqlite3.Cursor: ...
+
+def percentiles(con :sqlite3.Connection, since :float, fraction :float = TIMEOUT_PERCENTILE, limit :int = TIMEOUT_PROBES, path :str = '/lastsync') -> tuple[dict[str, float], dict[str, float]]: ...
+
+def percentile(samples :dict[str, list[float]], fraction :float) -> dict[str, float]: ...
+
+def timeouts(percentiles :dict[str, float], minimum :float, maximum :float) -> dict[str, float]: ...
+
+def host_timeout(timeouts :dict[str, float] | None, url :str) -> float | None: ...
+
+def breakers(con :sqlite3.Connection, since :float, streak :int = BREAKER_STREAK) -> dict[str, tuple[int, float]]: ...
+
+def breaker_due(failures :int, last :float, streak :int = BREAKER_STREAK) -> float: ...
+
+def breaker(breakers :dict[str, tuple[int, float]] | None, url :str, now :float) -> str | None: ...
@@ -0,0 +1,441 @@
+import asyncio
+import collections
+import contextlib
+import contextvars
+import email.parser
+import functools
+import http.client
+import io
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+from .connections import MAX_IDLE, Timing, record, trace
+from .records import MirrorRecord, still_down
+from .results import DEADLINE_CODE, ERRORS, NO_TIMES, crashed, error_code, evaluate
+
+# Same limit as urllib.request.HTTPRedirectHandler
+MAX_REDIRECTS = 10
+# Responses to these never have a body
+NO_BODY = (204, 304)
+
+# The Connections of the scan() a request is made for
+pooled = contextvars.ContextVar('pooled', default=None)
+
+
+@functools.cache
+def ssl_context():
+	return ssl.create_default_context()
+
+
+class Connections:
+	"""
+	Keeps the idle keep-alive connections of a scan() around, keyed by
+	(scheme, host, port), so that the requests towards the same mirror, or the
+	mirrors on the same host, share them the way connections.ConnectionPool does.
+	"""
+	def __init__(self, max_idle=MAX_IDLE):
+		self.max_idle = max_idle
+		self.idle = collections.OrderedDict()
+		self.idle_count = 0
+
+	def acquire(self, key):
+		"""
+		Returns (reader, writer) with an idle connection, or None if there is none
+		"""
+		while connections := self.idle.get(key):
+			reader, writer = connections.pop()
+			self.idle_count -= 1
+			if not connections:
+				del self.idle[key]
+
+			# The server might have hung up on it while it was idle
+			if not reader.at_eof() and not writer.is_closing():
+				return reader, writer
+			writer.close()
+
+		return None
+
+	def release(self, key, reader, writer):
+		self.idle.setdefault(key, []).append((reader, writer))
+		self.idle.move_to_end(key)
+		self.idle_count += 1
+
+		while self.idle_count > self.max_idle:
+			_, connections = self.idle.popitem(last=False)
+			self.idle_count -= len(connections)
+			for _, idle_writer in connections:
+				idle_writer.close()
+
+	def close(self):
+		for connections in self.idle.values():
+			for _, writer in connections:
+				writer.close()
+
+		self.idle.clear()
+		self.idle_count = 0
+
+
+async def read_body(reader, headers):
+	if headers.get('Transfer-Encoding', '').lower() == 'chunked':
+		body = b''
+		while (size := int((await reader.readline()).split(b';', 1)[0].strip() or b'0', 16)):
+			body += await reader.readexactly(size)
+			await reader.readline()
+
+		# Consume any trailers up until the final empty line
+		while (await reader.readline()).strip():
+			pass
+
+		return body
+	elif (length := headers.get('Content-Length')) is not None:
+		return await reader.readexactly(int(length))
+
+	return await reader.read()
+
+
+async def connect(host, port, secure, timeout):
+	"""
+	Opens a connection the same way asyncio.open_connection() would,
+	but resolves, connects and does the TLS handshake as separate steps
+	so that each of them can be timed. Returns (reader, writer, (dns, connect, tls)).
+	"""
+	loop = asyncio.get_running_loop()
+
+	started = time.perf_counter()
+	addresses = await asyncio.wait_for(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout)
+	resolved = time.perf_counter()
+
+	# StreamWriter.start_tls() only exists on Python 3.11+, before that
+	# the handshake is done as part of (and timed with) the TCP connect.
+	combined = secure and not hasattr(asyncio.StreamWriter, 'start_tls')
+
+	error = None
+	for family, socket_type, proto, canonname, address in addresses:
+		try:
+			reader, writer = await asyncio.wait_for(
+				asyncio.open_connection(
+					address[0],
+					port,
+					ssl=ssl_context() if combined else None,
+					server_hostname=host if combined else None
+				),
+				timeout
+			)
+			break
+		except OSError as connect_error:
+			error = connect_error
+	else:
+		raise error
+
+	connected = time.perf_counter()
+
+	if secure and not combined:
+		try:
+			await asyncio.wait_for(writer.start_tls(ssl_context(), server_hostname=host), timeout)
+		except BaseException:
+			writer.close()
+			raise
+
+	return reader, writer, (resolved - started, connected - resolved, time.perf_counter() - connected)
+
+
+async def exchange(url, timeout, phases):
+	"""
+	Does a single GET and returns (status, reason, headers, body, headers_at)
+	where headers_at is the time.perf_counter() at which the response headers
+	had arrived. Within a scan() an idle connection to the same host is reused
+	if there is one, otherwise a new one is made and the (dns, connect, tls)
+	timings of it are added to the list `phases` once it's connected.
+	"""
+	parsed = urllib.parse.urlsplit(url)
+	secure = parsed.scheme == 'https'
+	port = parsed.port or (443 if secure else 80)
+	key = (parsed.scheme, parsed.hostname, port)
+	connections = pooled.get()
+
+	if reused := connections and connections.acquire(key):
+		reader, writer = reused
+	else:
+		try:
+			reader, writer, connected = await connect(parsed.hostname, port, secure, timeout)
+		except asyncio.TimeoutError:
+			raise urllib.error.URLError(TimeoutError('timed out'))
+		except OSError as error:
+			raise urllib.error.URLError(error)
+
+		phases[:3] = [total + phase for total, phase in zip(phases, connected)]
+
+	keep = False
+	try:
+		target = parsed.path or '/'
+		if parsed.query:
+			target += f"?{parsed.query}"
+
+		writer.write((
+			f"GET {target} HTTP/1.1\r\n"
+			f"Host: {parsed.netloc.rsplit('@', 1)[-1]}\r\n"
+			"User-Agent: Python-urllib\r\n"
+			"Accept-Encoding: identity\r\n"
+			f"Connection: {'keep-alive' if connections else 'close'}\r\n"
+			"\r\n"
+		).encode())
+
+		try:
+			try:
+				status_line = await asyncio.wait_for(reader.readline(), timeout)
+			except ConnectionError:
+				if not reused:
+					raise
+				status_line = b''
+
+			# Hung up on in between, the request is made again over a new connection
+			if reused and not status_line:
+				return await exchange(url, timeout, phases)
+
+			version, status, reason = (status_line.decode('iso-8859-1').strip().split(' ', 2) + [''])[:3]
+			# Same as http.client, anything but a HTTP status line fails the mirror
+			if not version.startswith('HTTP/') or not 100 <= (status := int(status)) <= 999:
+				raise ValueError(f"Bad status line {status_line!r}")
+			header_data = b''
+			while (line := await asyncio.wait_for(reader.readline(), timeout)) not in (b'\r\n', b'\n', b''):
+				header_data += line
+			headers_at = time.perf_counter()
+			headers = email.parser.Parser(_class=http.client.HTTPMessage).parsestr(header_data.decode('iso-8859-1'))
+			body = b'' if status in NO_BODY else await asyncio.wait_for(read_body(reader, headers), timeout)
+			# Only a connection whose response ended where it says it does can take another request
+			keep = connections is not None and version == 'HTTP/1.1' and 'close' not in headers.get('Connection', '').lower() and (
+				status in NO_BODY or 'Content-Length' in headers or headers.get('Transfer-Encoding', '').lower() == 'chunked'
+			)
+		except asyncio.TimeoutError:
+			raise TimeoutError('The read operation timed out')
+		except (ValueError, asyncio.IncompleteReadError) as error:
+			raise urllib.error.URLError(error)
+		except OSError as error:
+			raise urllib.error.URLError(error)
+	finally:
+		if keep:
+			connections.release(key, reader, writer)
+		else:
+			writer.close()
+
+	return status, reason, headers, body, headers_at
+
+
+async def request(url, timeout, redirects=MAX_REDIRECTS):
+	"""
+	A minimal asyncio HTTP/1.1 GET, raising the same urllib.error
+	exceptions as urllib.request.urlopen() does so that results
+	map to the same time_delta_int codes as the threaded workers.
+
+	The connections.Timing of the request, failed or not, is recorded into the active trace().
+	"""
+	started = time.perf_counter()
+	requested = url
+	phases = [0.0, 0.0, 0.0, 0.0]
+	cancelled = False
+
+	try:
+		for redirect in range(redirects + 1):
+			status, reason, headers, body, headers_at = await exchange(url, timeout, phases)
+			phases[3] = headers_at - started
+
+			if status in (301, 302, 303, 307, 308) and (location := headers.get('Location')):
+				if redirect == redirects:
+					raise urllib.error.HTTPError(url, status, 'The HTTP server returned a redirect error that would lead to an infinite loop.', headers, io.BytesIO(body))
+
+				url = urllib.parse.urljoin(url, location)
+				continue
+
+			if not 200 <= status < 300:
+				raise urllib.error.HTTPError(url, status, reason, headers, io.BytesIO(body))
+
+			return body
+	except asyncio.CancelledError:
+		# The request that lost the race in hedged() is none of the probe's business
+		cancelled = True
+		raise
+	finally:
+		# A failed request is recorded as well, with the phases it got through
+		if not cancelled:
+			record(Timing(requested, *phases, time.perf_counter() - started))
+
+
+async def hedged(url, timeout, delay):
+	"""
+	request() which requests `url` a second time if the first request hasn't
+	been answered within `delay` seconds, returning (or raising) what whichever
+	of the two is done first does. The other one is cancelled.
+	"""
+	requests = [asyncio.ensure_future(request(url, timeout))]
+
+	try:
+		done, _ = await asyncio.wait(requests, timeout=delay)
+		if not done:
+			requests.append(asyncio.ensure_future(request(url, timeout)))
+			done, _ = await asyncio.wait(requests, return_when=asyncio.FIRST_COMPLETED)
+	finally:
+		for pending in requests:
+			pending.cancel()
+
+	return done.pop().result()
+
+
+async def probe(url, tier, tier_0, limit, timeout, verify_db=False, recheck=None, hedge=None):
+	"""
+	Fetches /lastsync and /lastupdate concurrently and returns
+	the same (good_exit, time_delta_int, time_delta_str, timings, times) result
+	as the threaded MirrorTesterPool would have.
+
+	With `recheck` seconds, /lastsync is requested alone within them first,
+	the same as records.MirrorRecord.recheck() does. With a `hedge`, /lastsync
+	is requested again if it hasn't been answered within that many seconds.
+	"""
+	async with limit:
+		with trace() as timings:
+			try:
+				if recheck:
+					with still_down():
+						await request(f"{url}/lastsync", recheck)
+
+				last_sync, last_update = await asyncio.gather(
+					hedged(f"{url}/lastsync", timeout, hedge) if hedge else request(f"{url}/lastsync", timeout),
+					request(f"{url}/lastupdate", timeout)
+				)
+			except ERRORS as error:
+				return False, error_code(error), str(error), timings, NO_TIMES
+
+		frozen_mirror = functools.partial(MirrorRecord, tier=tier, url=url, tier_0=tier_0, last_sync=last_sync, last_update=last_update, verify_db=verify_db, timeout=timeout)
+		if verify_db:
+			# Verifying the package databases is done with blocking requests
+			good_exit, time_delta_int, time_delta_str, db_timings, times = await asyncio.to_thread(evaluate, frozen_mirror)
+			return good_exit, time_delta_int, time_delta_str, timings + db_timings, times
+
+	good_exit, time_delta_int, time_delta_str, _, times = evaluate(frozen_mirror)
+
+	return good_exit, time_delta_int, time_delta_str, timings, times
+
+
+async def threaded(iterable):
+	"""
+	Yields the items of a blocking iterable (a mirrorlist still being downloaded),
+	which is read in a thread of its own so that it doesn't hold up the event loop.
+	An error raised by the iterable is raised here once its items so far are yielded.
+	"""
+	loop = asyncio.get_running_loop()
+	queue = asyncio.Queue()
+	stop = threading.Event()
+
+	def _put(more, item):
+		# The loop might be gone once we're no longer read from
+		if not stop.is_set():
+			loop.call_soon_threadsafe(queue.put_nowait, (more, item))
+
+	def _read():
+		try:
+			for item in iterable:
+				if stop.is_set():
+					return
+				_put(True, item)
+		except Exception as error:
+			_put(False, error)
+		else:
+			_put(False, None)
+
+	threading.Thread(target=_read, daemon=True).start()
+
+	try:
+		while True:
+			more, item = await queue.get()
+			if more:
+				yield item
+			elif item is None:
+				return
+			else:
+				raise item
+	finally:
+		stop.set()
+
+
+async def scan(urls, tier_0, concurrency, callback, tier=2, verify_db=False, timeouts=None, per_host=None, breakers=None, hedges=None, deadline=None):
+	"""
+	Probes all the given mirror URLs with at most `concurrency` mirrors
+	in flight at any given time. callback(url, good_exit, time_delta_int, time_delta_str, timings, times)
+	is called for each mirror as soon as its probe finishes.
+
+	Hosts found in `timeouts` (see database.timeouts()) use that timeout instead of CON_TIMEOUT.
+	With `per_host`, no more than that many mirrors on the same host are probed at once.
+	Mirrors on the hosts in `breakers` (see database.breakers()) are skipped or only
+	rechecked, callback() isn't called for the skipped ones. Hosts found in `hedges`
+	(see database.percentiles()) have /lastsync hedged after that many seconds.
+
+	Probes still going at the time.monotonic() `deadline` are cancelled, and their
+	mirrors fail with the DEADLINE_CODE. URLs still coming by then aren't probed at all.
+	`urls` is read in a thread, should it raise (the mirrorlist broke off), the error is
+	raised once the probes of the URLs so far are done.
+	"""
+	from .database import RECHECK, SKIP, breaker, host_timeout
+	from .pool import host
+	from .session import configuration
+
+	limit = asyncio.Semaphore(concurrency)
+	hosts = collections.defaultdict(lambda: asyncio.Semaphore(per_host))
+	connections = Connections()
+	# Seen by every probe, as they're started from here
+	pooled.set(connections)
+
+	async def _probe(url, recheck):
+		# Waiting for the host first, so that a mirror waiting on its host doesn't hold up one on another
+		async with hosts[host(url)] if per_host else contextlib.nullcontext():
+			try:
+				result = await probe(url, tier, tier_0, limit, host_timeout(timeouts, url) or configuration.CON_TIMEOUT, verify_db, recheck, host_timeout(hedges, url))
+			except Exception as error:
+				result = crashed(error)
+
+		callback(url, *result)
+
+	now = time.time()
+	probes = {}
+	broken = None
+
+	async def _dispatch():
+		nonlocal broken
+
+		try:
+			async with contextlib.aclosing(threaded(urls)) as coming:
+				async for url in coming:
+					if (state := breaker(breakers, url, now)) != SKIP:
+						probes[asyncio.ensure_future(_probe(url, configuration.CON_TIMEOUT_MIN if state == RECHECK else None))] = url
+						# Lets the probe get going while the rest of `urls` is still coming
+						await asyncio.sleep(0)
+		except Exception as error:
+			broken = error
+
+	# Stops waiting for more URLs at the deadline
+	with contextlib.suppress(asyncio.TimeoutError):
+		await asyncio.wait_for(_dispatch(), None if deadline is None else max(deadline - time.monotonic(), 0))
+
+	if not probes:
+		if broken:
+			raise broken
+		return
+
+	done, pending = await asyncio.wait(probes, timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+
+	for task in pending:
+		task.cancel()
+		callback(probes[task], False, DEADLINE_CODE, "Not done by the deadline of the scan", [], NO_TIMES)
+
+	# Lets the cancelled probes close their connections
+	await asyncio.gather(*pending, return_exceptions=True)
+	connections.close()
+
+	# Same as asyncio.gather() would, an error of callback() itself fails the scan
+	for task in done:
+		task.result()
+
+	if broken:
+		raise broken
@@ -0,0 +1,50 @@
+import asyncio
+import collections
+import contextvars
+import datetime
+import http.client
+import ssl
+import typing
+
+from .connections import MAX_IDLE, Timing
+from .models import Tier0
+from .results import Result, Times
+
+MAX_REDIRECTS :int
+NO_BODY :tuple[int, ...]
+T = typing.TypeVar('T')
+
+pooled :contextvars.ContextVar[Connections | None]
+
+
+class Connections:
+	max_idle :int
+	idle :collections.OrderedDict[tuple[str, str | None, int], list[tuple[asyncio.StreamReader, asyncio.StreamWriter]]]
+	idle_count :int
+
+	def __init__(self, max_idle :int = MAX_IDLE) -> None: ...
+
+	def acquire(self, key :tuple[str, str | None, int]) -> tuple[asyncio.StreamReader, asyncio.StreamWriter] | None: ...
+
+	def release(self, key :tuple[str, str | None, int], reader :asyncio.StreamReader, writer :asyncio.StreamWriter) -> None: ...
+
+	def close(self) -> None: ...
+
+
+def ssl_context() -> ssl.SSLContext: ...
+
+async def read_body(reader :asyncio.StreamReader, headers :http.client.HTTPMessage) -> bytes: ...
+
+async def connect(host :str, port :int, secure :bool, timeout :float) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, tuple[float, float, float]]: ...
+
+async def exchange(url :str, timeout :float, phases :list[float]) -> tuple[int, str, http.client.HTTPMessage, bytes, float]: ...
+
+async def request(url :str, timeout :float, redirects :int = MAX_REDIRECTS) -> bytes: ...
+
+async def hedged(url :str, timeout :float, delay :float) -> bytes: ...
+
+async def probe(url :str, tier :int, tier_0 :Tier0, limit :asyncio.Semaphore, timeout :float, verify_db :bool = False, recheck :float | None = None, hedge :float | None = None) -> Result: ...
+
+def threaded(iterable :typing.Iterable[T]) -> typing.AsyncGenerator[T, None]: ...
+
+async def scan(urls :typing.Iterable[str], tier_0 :Tier0, concurrency :int, callback :typing.Callable[[str, bool, float, datetime.timedelta | str, list[Timing], Times], None], tier :int = 2, verify_db :bool = False, timeouts :dict[str, float] | None = None, per_host :int | None = None, breakers :dict[str, tuple[int, float]] | None = None, hedges :dict[str, float] | None = None, deadline :float | None = None) -> None: ...
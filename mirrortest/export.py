@@ -0,0 +1,174 @@
+import datetime
+import http.server
+import json
+import threading
+import time
+
+# Upper bounds of the Prometheus histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DRIFT_BUCKETS = (60, 600, 3600, 3600 * 2, 3600 * 6, 86400, 86400 * 7)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def epoch(value):
+	"""
+	Returns the unix time of a last_sync or last_update, or None
+	"""
+	return value.timestamp() if isinstance(value, datetime.datetime) else None
+
+
+def latency(timings):
+	"""
+	Returns the seconds the slowest request of a probe took, or None without any
+	"""
+	return max((timing.total for timing in timings), default=None)
+
+
+def json_line(unix_time, url, tier, good_exit, time_delta_int, time_delta_str, timings, times):
+	"""
+	Returns a result as one line of JSON (including the newline), with the drift
+	in seconds or the negative result code, whichever it is, and the timings of every request.
+	"""
+	last_sync, last_update = times
+
+	return json.dumps({
+		'time': unix_time,
+		'url': url,
+		'tier': tier,
+		'good': bool(good_exit),
+		'code': int(time_delta_int) if time_delta_int < 0 else 0,
+		'drift': time_delta_int if time_delta_int >= 0 else None,
+		'message': str(time_delta_str),
+		'last_sync': epoch(last_sync),
+		'last_update': epoch(last_update),
+		'timings': [timing._asdict() for timing in timings],
+	}) + '\n'
+
+
+def escape(value):
+	return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+	"""
+	A Prometheus histogram of observed values
+	"""
+	def __init__(self, buckets):
+		self.buckets = buckets
+		self.counts = [0] * len(buckets)
+		self.count = 0
+		self.sum = 0.0
+
+	def observe(self, value):
+		for index, bound in enumerate(self.buckets):
+			if value <= bound:
+				self.counts[index] += 1
+
+		self.count += 1
+		self.sum += value
+
+	def lines(self, name):
+		for bound, count in zip(self.buckets, self.counts):
+			yield f'{name}_bucket{{le="{bound}"}} {count}'
+
+		yield f'{name}_bucket{{le="+Inf"}} {self.count}'
+		yield f'{name}_sum {self.sum}'
+		yield f'{name}_count {self.count}'
+
+
+class Metrics:
+	"""
+	Keeps the last result of every mirror along with counters and histograms over all
+	of them, and with a `port` serves them in the Prometheus text format on /metrics
+	from a background thread until it's closed.
+	"""
+	def __init__(self, port=None, address=''):
+		self.lock = threading.Lock()
+		self.mirrors = {}
+		self.probes = {}
+		self.latency = Histogram(LATENCY_BUCKETS)
+		self.drift = Histogram(DRIFT_BUCKETS)
+		self.server = None
+
+		if port is not None:
+			self.server = http.server.ThreadingHTTPServer((address, port), MetricsHandler)
+			self.server.metrics = self
+			threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def observe(self, url, good_exit, time_delta_int, time_delta_str, timings, times):
+		"""
+		Takes in a (url, good_exit, time_delta_int, time_delta_str, timings, times) result
+		"""
+		code = int(time_delta_int) if time_delta_int < 0 else 0
+		seconds = latency(timings)
+
+		with self.lock:
+			self.mirrors[url] = (bool(good_exit), code, time_delta_int if time_delta_int >= 0 else None, *(epoch(value) for value in times), seconds, time.time())
+			self.probes[(bool(good_exit), code)] = self.probes.get((bool(good_exit), code), 0) + 1
+
+			if seconds is not None:
+				self.latency.observe(seconds)
+			if time_delta_int >= 0:
+				self.drift.observe(time_delta_int)
+
+	def render(self):
+		"""
+		Returns the metrics in the Prometheus text exposition format
+		"""
+		gauges = (
+			('mirrortest_mirror_up', "Whether the mirror passed its last test"),
+			('mirrortest_mirror_result_code', "The negative result code of the last test of the mirror, 0 if it could be compared against the Tier0"),
+			('mirrortest_mirror_drift_seconds', "How far behind the Tier0 the mirror was at its last test"),
+			('mirrortest_mirror_last_sync_timestamp_seconds', "The /lastsync of the mirror"),
+			('mirrortest_mirror_last_update_timestamp_seconds', "The /lastupdate of the mirror"),
+			('mirrortest_mirror_latency_seconds', "How long the slowest request of the last test of the mirror took"),
+			('mirrortest_mirror_tested_timestamp_seconds', "When the mirror was last tested"),
+		)
+
+		with self.lock:
+			lines = []
+			for index, (name, help_text) in enumerate(gauges):
+				lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+				for url, values in sorted(self.mirrors.items()):
+					if (value := values[index]) is not None:
+						lines.append(f'{name}{{url="{escape(url)}"}} {float(value)}')
+
+			lines += ["# HELP mirrortest_probes_total Mirrors tested, by outcome and result code", "# TYPE mirrortest_probes_total counter"]
+			for (good_exit, code), count in sorted(self.probes.items()):
+				lines.append(f'mirrortest_probes_total{{good="{str(good_exit).lower()}",code="{code}"}} {count}')
+
+			for name, histogram, help_text in (
+				('mirrortest_probe_latency_seconds', self.latency, "How long the slowest request of each test took"),
+				('mirrortest_drift_seconds', self.drift, "How far behind the Tier0 each tested mirror was"),
+			):
+				lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram", *histogram.lines(name)]
+
+		return '\n'.join(lines) + '\n'
+
+	def close(self):
+		if self.server:
+			self.server.shutdown()
+			self.server.server_close()
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+	def do_GET(self):
+		if self.path.split('?', 1)[0] != '/metrics':
+			self.send_error(404)
+			return
+
+		body = self.server.metrics.render().encode()
+		self.send_response(200)
+		self.send_header('Content-Type', CONTENT_TYPE)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
@@ -0,0 +1,60 @@
+import datetime
+import http.server
+import threading
+import typing
+
+from .connections import Timing
+from .results import Times
+
+LATENCY_BUCKETS :tuple[float, ...]
+DRIFT_BUCKETS :tuple[float, ...]
+CONTENT_TYPE :str
+
+
+def epoch(value :datetime.datetime | None) -> float | None: ...
+
+def latency(timings :list[Timing]) -> float | None: ...
+
+def json_line(unix_time :float, url :str, tier :int, good_exit :bool | None, time_delta_int :float, time_delta_str :datetime.timedelta | str, timings :list[Timing], times :Times) -> str: ...
+
+def escape(value :str) -> str: ...
+
+
+class Histogram:
+	buckets :tuple[float, ...]
+	counts :list[int]
+	count :int
+	sum :float
+
+	def __init__(self, buckets :tuple[float, ...]) -> None: ...
+
+	def observe(self, value :float) -> None: ...
+
+	def lines(self, name :str) -> typing.Iterator[str]: ...
+
+
+class Metrics:
+	lock :threading.Lock
+	mirrors :dict[str, tuple[bool, int, float | None, float | None, float | None, float | None, float]]
+	probes :dict[tuple[bool, int], int]
+	latency :Histogram
+	drift :Histogram
+	server :http.server.ThreadingHTTPServer | None
+
+	def __init__(self, port :int | None = None, address :str = '') -> None: ...
+
+	def __enter__(self) -> 'Metrics': ...
+
+	def __exit__(self, *args :typing.Any) -> None: ...
+
+	def observe(self, url :str, good_exit :bool | None, time_delta_int :float, time_delta_str :datetime.timedelta | str, timings :list[Timing], times :Times) -> None: ...
+
+	def render(self) -> str: ...
+
+	def close(self) -> None: ...
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+	def do_GET(self) -> None: ...
+
+	def log_message(self, *args :typing.Any) -> None: ...
@@ -226,9 +226,20 @@ else:
 			else:
 				return webbrowser.open
 
-	if os.environ.get("DISPLAY"):
-		register_X_controllers()
-	_open = get()
+	def _detect_open(filename):
+		"""
+		Picks the controller on first use rather than on import,
+		as detecting the desktop environment runs xprop.
+		"""
+		global _open
+
+		if os.environ.get("DISPLAY"):
+			register_X_controllers()
+		_open = get()
+
+		return _open(filename)
+
+	_open = _detect_open
 
 
 def open(filename):
@@ -34,6 +34,8 @@ def register_X_controllers() -> None: ...
 
 def get() -> bool: ...
 
+def _detect_open(filename :str) -> bool: ...
+
 def open(filename :str) -> bool: ...
 
 def _fix_addersses(**kwargs :typing.Dict[str, str]) -> typing.Dict[str, str]: ...
@@ -1,7 +1,14 @@
-import urllib.request
 import datetime
+import functools
+import threading
+import typing
+import base64
+import urllib.parse
 import pydantic
 
+# Guards the lazy creation of Tier0.index
+index_lock = threading.Lock()
+
 
 @pydantic.dataclasses.dataclass
 class Configuration():
@@ -9,7 +16,14 @@ class Configuration():
 	MAX_TIER1_SYNC_DRIFT_SEC :int = 3600 * 2  # 2h
 	MAX_TIER2_SYNC_DRIFT_SEC :int = 3600 * 6  # 6h
 	CON_TIMEOUT :int = 5
+	CACHE_TTL :int = 60  # How long the mirrorlist and Tier0 responses are reused without asking again
 	DEFAULT_TIER_NR :int = 2  # Which is the default tier to assume without giving --tier
+	MIRRORLIST :str = "https://archlinux.org/mirrorlist/all/"  # Which mirrorlist --mirror '*' tests
+	# Bounds of the timeouts learned per host from earlier probes when testing all mirrors
+	CON_TIMEOUT_MIN :float = 1.0
+	CON_TIMEOUT_MAX :float = 15.0
+	# How many mirrors on the same host are tested at once when testing all mirrors, 0 for no limit
+	MAX_PER_HOST :int = 1
 	USERNAME :str | None = None
 	PASSWORD :str | None = None
 	email :bool = False
@@ -36,62 +50,144 @@ class Mirror(pydantic.BaseModel):
 
 
 class Tier0(Mirror):
+	_index :typing.Any = pydantic.PrivateAttr(default=None)
+
 	@pydantic.model_validator(mode='before')
 	def update_times(cls, values):
 		"""
 		At this stage, the class is not instanciated.
 		So we will update the dictionary of values before being set
 		as class properties (pydantic quirk).
+
+		Raw /lastsync and /lastupdate responses that were already
+		fetched (by the async engine for instance) are parsed as-is.
 		"""
-		values['last_sync'] = datetime.datetime.fromtimestamp(int(Tier0.request(str(values['url']), '/lastsync').strip()))
-		values['last_update'] = datetime.datetime.fromtimestamp(int(Tier0.request(str(values['url']), '/lastupdate').strip()))
+		if 'last_sync' not in values or 'last_update' not in values:
+			last_sync, last_update = Tier0.request_times(str(values['url']))
+			values.setdefault('last_sync', last_sync)
+			values.setdefault('last_update', last_update)
+
+		for key in ('last_sync', 'last_update'):
+			if isinstance(values[key], bytes):
+				values[key] = datetime.datetime.fromtimestamp(int(values[key].strip()))
 
 		return values
 
 	@staticmethod
-	def request(url, path):  # pragma: no cover
-		from .session import configuration
-
+	def authenticate(url, path):  # pragma: no cover
 		"""
 		We can re-work this in the future, but to keep it copy-paste friendly
 		from the https://archlinux.org/devel/tier0mirror/ page this is what we need to do.
+
+		Returns the (request_url, headers) to use for a given path on the Tier0.
 		"""
-		USERNAME, password = url[8:].split(':', 1)
-		PASSWORD, domain = password.split('@', 1)
-		DOMAIN, _ = domain.split('/', 1)
+		from .session import configuration
+
+		parsed = urllib.parse.urlsplit(url)
+		USERNAME, PASSWORD = parsed.username, parsed.password
 
 		configuration.USERNAME = USERNAME
 		configuration.PASSWORD = PASSWORD
 
-		request_url = f'{url[:5]}://{DOMAIN}{path}'
+		request_url = f"{parsed.scheme}://{parsed.netloc.rsplit('@', 1)[-1]}{path}"
+		authorization = base64.b64encode(f"{USERNAME}:{PASSWORD}".encode()).decode()
+
+		return request_url, {
+			'Authorization': f'Basic {authorization}',
+			'User-agent': 'Python/3.10'
+		}
+
+	@staticmethod
+	def request(url, path):  # pragma: no cover
+		from .session import configuration
+		from .cache import cache
 
-		password_mgr = urllib.request.HTTPPasswordMgrWithDefaultRealm()
-		password_mgr.add_password(None, request_url, USERNAME, PASSWORD)
-		handler = urllib.request.HTTPBasicAuthHandler(password_mgr)
-		opener = urllib.request.build_opener(handler)
-		opener.addheaders = [('User-agent', 'Python/3.10')]
-		urllib.request.install_opener(opener)
+		request_url, headers = Tier0.authenticate(url, path)
 
-		req = urllib.request.Request(request_url)
-		resp = urllib.request.urlopen(req, timeout=configuration.CON_TIMEOUT)
-		contents = resp.read()
+		return cache.request(request_url, configuration.CON_TIMEOUT, configuration.CACHE_TTL, headers=headers)
 
-		return bytes(contents)
+	@staticmethod
+	def stream(url, path):  # pragma: no cover
+		from .session import configuration
+		from .connections import pool
+
+		request_url, headers = Tier0.authenticate(url, path)
+
+		return pool.stream(request_url, configuration.CON_TIMEOUT, headers=headers)
+
+	@staticmethod
+	def request_times(url):
+		"""
+		Requests /lastsync and /lastupdate at the same time,
+		with a single CON_TIMEOUT deadline for the both of them.
+		"""
+		from .session import configuration
+		from .connections import gather
+
+		return gather(
+			functools.partial(Tier0.request, url, '/lastsync'),
+			functools.partial(Tier0.request, url, '/lastupdate'),
+			timeout=configuration.CON_TIMEOUT
+		)
 
 	def get_db(self, repo):
 		"""
 		Returns a given gzipped database from this mirror
 		"""
-		return Tier0.request(self.url, f'/{repo}/os/{self.arch}/{repo}.db.tar.gz')
+		return Tier0.request(str(self.url), f'/{repo}/os/{self.arch}/{repo}.db.tar.gz')
+
+	def stream_db(self, repo):
+		"""
+		Returns a context manager yielding the still unread
+		response of a given gzipped database from this mirror
+		"""
+		return Tier0.stream(str(self.url), f'/{repo}/os/{self.arch}/{repo}.db.tar.gz')
+
+	def head_db(self, repo):
+		"""
+		Returns the headers of a given gzipped database from this mirror
+		"""
+		from .session import configuration
+		from .connections import pool
+
+		request_url, headers = Tier0.authenticate(str(self.url), f'/{repo}/os/{self.arch}/{repo}.db.tar.gz')
+		response, _ = pool.request(request_url, configuration.CON_TIMEOUT, headers=headers, method='HEAD')
+
+		return response.headers
+
+	@property
+	def index(self):
+		"""
+		The repodb.Tier0Index of this Tier0, shared by all
+		mirrors that are compared against it.
+		"""
+		from .repodb import Tier0Index
+
+		with index_lock:
+			if self._index is None:
+				self._index = Tier0Index(self)
+
+		return self._index
 
 	def refresh(self):
-		self.last_update = datetime.datetime.fromtimestamp(int(Tier0.request(str(self.url), '/lastupdate').strip()))
-		self.last_sync = datetime.datetime.fromtimestamp(int(Tier0.request(str(self.url), '/lastsync').strip()))
+		last_sync, last_update = Tier0.request_times(str(self.url))
+		last_update = datetime.datetime.fromtimestamp(int(last_update.strip()))
+
+		# The Tier0 has new packages, so its databases have to be fetched again
+		if last_update != self.last_update:
+			with index_lock:
+				self._index = None
+
+		self.last_update = last_update
+		self.last_sync = datetime.datetime.fromtimestamp(int(last_sync.strip()))
 
 
 class MirrorTester(Mirror):
 	tier :int
 	tier_0 :Tier0
+	verify_db :bool = False  # Also compare the package databases against the Tier0 in .valid
+	packages_behind :str | None = None
+	timeout :float | None = None  # Instead of CON_TIMEOUT, see database.timeouts()
 
 	@pydantic.model_validator(mode='before')
 	def update_times(cls, values):
@@ -99,33 +195,86 @@ class MirrorTester(Mirror):
 		At this stage, the class is not instanciated.
 		So we will update the dictionary of values before being set
 		as class properties (pydantic quirk).
+
+		Raw /lastsync and /lastupdate responses that were already
+		fetched (by the async engine for instance) are parsed as-is.
 		"""
-		if last_sync_request := MirrorTester.request(str(values['url']), '/lastsync').strip():
-			values['last_sync'] = datetime.datetime.fromtimestamp(int(last_sync_request))
-		if last_update_request := MirrorTester.request(str(values['url']), '/lastupdate').strip():
-			values['last_update'] = datetime.datetime.fromtimestamp(int(last_update_request))
+		if 'last_sync' not in values or 'last_update' not in values:
+			last_sync, last_update = MirrorTester.request_times(str(values['url']), values.get('timeout'))
+			values.setdefault('last_sync', last_sync)
+			values.setdefault('last_update', last_update)
+
+		for key in ('last_sync', 'last_update'):
+			if isinstance(values[key], bytes):
+				values[key] = datetime.datetime.fromtimestamp(int(timestamp)) if (timestamp := values[key].strip()) else None
 
 		return values
 
 	@staticmethod
-	def request(url, path):
+	def request(url, path, timeout=None):
 		from .session import configuration
+		from .connections import pool
 
 		if path[0] == '/':  # pragma: no cover
 			path = path[1:]
 
-		response = urllib.request.urlopen(f"{url}/{path}", timeout=configuration.CON_TIMEOUT)
-		data = response.read()
+		# pydantic.AnyUrl adds a trailing slash to bare hosts
+		_, data = pool.request(f"{str(url).rstrip('/')}/{path}", timeout or configuration.CON_TIMEOUT)
+
+		return data
+
+	@staticmethod
+	def stream(url, path, timeout=None):
+		from .session import configuration
+		from .connections import pool
 
-		return bytes(data)
+		if path[0] == '/':  # pragma: no cover
+			path = path[1:]
+
+		return pool.stream(f"{str(url).rstrip('/')}/{path}", timeout or configuration.CON_TIMEOUT)
+
+	@staticmethod
+	def request_times(url, timeout=None, hedge=None):
+		"""
+		Requests /lastsync and /lastupdate at the same time,
+		with a single (CON_TIMEOUT by default) deadline for the both of them.
+		With a `hedge`, /lastsync is requested again if it hasn't been answered
+		within that many seconds (see connections.hedged()).
+		"""
+		from .session import configuration
+		from .connections import gather, hedged
+
+		timeout = timeout or configuration.CON_TIMEOUT
+
+		last_sync = functools.partial(MirrorTester.request, url, '/lastsync', timeout)
+		if hedge:
+			last_sync = functools.partial(hedged, last_sync, hedge)
+
+		return gather(
+			last_sync,
+			functools.partial(MirrorTester.request, url, '/lastupdate', timeout),
+			timeout=timeout
+		)
 
 	def get_db(self, repo):
-		return MirrorTester.request(self.url, f'/{repo}/os/{self.arch}/{repo}.db.tar.gz')
+		return MirrorTester.request(self.url, f'/{repo}/os/{self.arch}/{repo}.db.tar.gz', self.timeout)
+
+	def stream_db(self, repo):
+		return MirrorTester.stream(self.url, f'/{repo}/os/{self.arch}/{repo}.db.tar.gz', self.timeout)
+
+	def head_db(self, repo):
+		from .session import configuration
+		from .connections import pool
+
+		response, _ = pool.request(f"{str(self.url).rstrip('/')}/{repo}/os/{self.arch}/{repo}.db.tar.gz", self.timeout or configuration.CON_TIMEOUT, method='HEAD')
+
+		return response.headers
 
 	@property
 	def valid(self):
 		from .session import configuration
 		from .mailhandle import mailto
+		from .repodb import behind
 
 		if (tier0_sync := self.tier_0.last_sync) is None or (self_sync := self.last_sync) is None:  # pragma: no cover
 			if tier0_sync is None:
@@ -191,4 +340,11 @@ class MirrorTester(Mirror):
 			print(f"{self.url} is out of sync {last_sync_delta}")
 			return False
 
+		# Up to date timestamps could still be lying, so check the actual databases.
+		# Cheap HEAD requests first, and only download the databases that differ.
+		if self.verify_db and (packages_behind := behind(self)):
+			print(f"{self.url} is behind the Tier0 ({packages_behind})")
+			self.packages_behind = packages_behind
+			return False
+
 		return True
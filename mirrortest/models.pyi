@@ -1,13 +1,24 @@
 import pydantic
 import typing
 import datetime
+import http.client
+import threading
+
+from .repodb import Tier0Index
+
+index_lock :threading.Lock
 
 
 class Configuration():
 	MAX_TIER1_SYNC_DRIFT_SEC :int = 3600 * 2
 	MAX_TIER2_SYNC_DRIFT_SEC :int = 3600 * 6
 	CON_TIMEOUT :int = 5
+	CACHE_TTL :int = 60
 	DEFAULT_TIER_NR :int = 2
+	MIRRORLIST :str = "https://archlinux.org/mirrorlist/all/"
+	CON_TIMEOUT_MIN :float = 1.0
+	CON_TIMEOUT_MAX :float = 15.0
+	MAX_PER_HOST :int = 1
 	USERNAME :str | None = None
 	PASSWORD :str | None = None
 	email :bool = False
@@ -24,24 +35,53 @@ class Mirror(pydantic.BaseModel):
 class Tier0(Mirror):
 	def update_times(cls, values :typing.Dict[str, typing.Union[str, datetime.datetime]]) -> typing.Dict[str, typing.Union[str, datetime.datetime]]: ...
 
+	@staticmethod
+	def authenticate(url :str, path :str) -> tuple[str, dict[str, str]]: ...
+
 	@staticmethod
 	def request(url :str, path :str) -> bytes: ...
 
+	@staticmethod
+	def stream(url :str, path :str) -> typing.ContextManager[http.client.HTTPResponse]: ...
+
+	@staticmethod
+	def request_times(url :str) -> list[bytes]: ...
+
 	def get_db(self, repo :str) -> bytes: ...
 
+	def stream_db(self, repo :str) -> typing.ContextManager[http.client.HTTPResponse]: ...
+
+	def head_db(self, repo :str) -> http.client.HTTPMessage: ...
+
+	@property
+	def index(self) -> Tier0Index: ...
+
 	def refresh(self) -> None: ...
 
 
 class MirrorTester(Mirror):
 	tier :int
 	tier_0 :Tier0
+	verify_db :bool = False
+	packages_behind :str | None = None
+	timeout :float | None = None
 
 	def update_times(cls, values :typing.Dict[str, typing.Union[str, datetime.datetime]]) -> typing.Dict[str, typing.Union[str, datetime.datetime]]: ...
 
 	@staticmethod
-	def request(url :str, path :str) -> bytes: ...
+	def request(url :str, path :str, timeout :float | None = None) -> bytes: ...
+
+	@staticmethod
+	def request_times(url :str, timeout :float | None = None, hedge :float | None = None) -> list[bytes]: ...
+
+	@staticmethod
+	def stream(url :str, path :str, timeout :float | None = None) -> typing.ContextManager[http.client.HTTPResponse]: ...
 
 	def get_db(self, repo :str) -> bytes: ...
 
+	def stream_db(self, repo :str) -> typing.ContextManager[http.client.HTTPResponse]: ...
+
+	def head_db(self, repo :str) -> http.client.HTTPMessage: ...
+
 	@property
 	def valid(self) -> bool: ...
@@ -0,0 +1,173 @@
+import collections
+import contextlib
+import threading
+import time
+import queue
+import urllib.parse
+
+from .results import crashed, evaluate
+
+
+def host(url):
+	"""
+	The host a mirror URL is on, the same for its http:// and https:// and any path
+	"""
+	return urllib.parse.urlsplit(url).hostname
+
+
+class MirrorTesterPool:
+	"""
+	A fixed number of worker threads testing frozen MirrorTesters.
+	Each result is put on a completion queue the moment it's done,
+	so the dispatcher never has to poll the workers for their state.
+
+	With `per_host`, no more than that many mirrors on the same host are
+	tested at once. The rest wait their turn, and a worker done with a mirror
+	goes on with the next waiting one on the same host over the connection it
+	just let go of, while the other workers keep the other hosts busy.
+
+	A pool can be cancel()'ed once it's taking too long, leaving
+	the workers that are still testing a mirror behind.
+	"""
+	def __init__(self, workers, per_host=None):
+		self.tasks = queue.SimpleQueue()
+		self.completed = queue.SimpleQueue()
+		self.pending = 0
+		self.unfinished = collections.Counter()
+		self.cancelled = False
+		self.per_host = per_host
+		self.lock = threading.Lock()
+		self.running = collections.Counter()
+		self.waiting = {}
+		self.threads = [threading.Thread(target=self._work, daemon=True) for _ in range(max(workers, 1))]
+
+		for thread in self.threads:
+			thread.start()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def _work(self):
+		while (frozen_mirror := self.tasks.get()) is not None:
+			while frozen_mirror is not None:
+				try:
+					result = evaluate(frozen_mirror)
+				except Exception as error:
+					result = crashed(error)
+
+				self.completed.put((frozen_mirror.keywords['url'], result))
+
+				frozen_mirror = self._next(frozen_mirror.keywords['url'])
+
+	def _next(self, url):
+		"""
+		Returns the next waiting mirror on the same host as `url`, or None
+		once there are none left and the host has one less mirror running
+		"""
+		if not self.per_host:
+			return None
+
+		name = host(url)
+		with self.lock:
+			if waiting := self.waiting.get(name):
+				frozen_mirror = waiting.popleft()
+				if not waiting:
+					del self.waiting[name]
+				return frozen_mirror
+
+			self.running[name] -= 1
+			if not self.running[name]:
+				del self.running[name]
+
+		return None
+
+	def _result(self, completed):
+		self.pending -= 1
+
+		url, result = completed
+		self.unfinished[url] -= 1
+		if not self.unfinished[url]:
+			del self.unfinished[url]
+
+		return (url, *result)
+
+	def submit(self, frozen_mirror):
+		self.pending += 1
+		self.unfinished[frozen_mirror.keywords['url']] += 1
+
+		if self.per_host:
+			name = host(frozen_mirror.keywords['url'])
+			with self.lock:
+				if self.running[name] >= self.per_host:
+					self.waiting.setdefault(name, collections.deque()).append(frozen_mirror)
+					return
+
+				self.running[name] += 1
+
+		self.tasks.put(frozen_mirror)
+
+	def finished(self, timeout=0):
+		"""
+		Yields the (url, good_exit, time_delta_int, time_delta_str, timings, times) results
+		that have completed so far, waiting at most `timeout` seconds for the first one.
+		"""
+		while self.pending:
+			try:
+				completed = self.completed.get(timeout=timeout) if timeout else self.completed.get_nowait()
+			except queue.Empty:
+				return
+
+			timeout = 0
+
+			yield self._result(completed)
+
+	def results(self, deadline=None):
+		"""
+		Yields the (url, good_exit, time_delta_int, time_delta_str, timings, times) results
+		of every submitted mirror in the order they complete, or of those that
+		complete before the time.monotonic() `deadline`.
+		"""
+		while self.pending:
+			if deadline is None:
+				completed = self.completed.get()
+			else:
+				try:
+					completed = self.completed.get(timeout=max(deadline - time.monotonic(), 0))
+				except queue.Empty:
+					return
+
+			yield self._result(completed)
+
+	def cancel(self):
+		"""
+		Drops the mirrors that are still waiting to be tested and returns the URLs of
+		every mirror without a result yet. No more results are yielded after this, and
+		close() no longer waits for the workers that are still testing a mirror.
+		"""
+		with self.lock:
+			self.waiting.clear()
+
+		with contextlib.suppress(queue.Empty):
+			while True:
+				self.tasks.get_nowait()
+
+		urls = list(self.unfinished.elements())
+		self.unfinished.clear()
+		self.pending = 0
+		self.cancelled = True
+
+		return urls
+
+	def close(self):
+		for _ in self.threads:
+			self.tasks.put(None)
+
+		# The workers are daemon threads, those still stuck on a mirror are left to time out on their own
+		if self.cancelled:
+			return
+
+		for thread in self.threads:
+			thread.join()
@@ -0,0 +1,52 @@
+import collections
+import datetime
+import functools
+import queue
+import threading
+import typing
+
+from .connections import Timing
+from .models import MirrorTester
+from .records import MirrorRecord
+from . import results
+
+Result = tuple[str, bool, float, datetime.timedelta | str, list[Timing], results.Times]
+FrozenMirror = functools.partial[MirrorTester] | functools.partial[MirrorRecord]
+
+
+def host(url :str) -> str | None: ...
+
+
+class MirrorTesterPool:
+	tasks :queue.SimpleQueue[FrozenMirror | None]
+	completed :queue.SimpleQueue[tuple[str, results.Result]]
+	pending :int
+	unfinished :collections.Counter[str]
+	cancelled :bool
+	per_host :int | None
+	lock :threading.Lock
+	running :collections.Counter[str | None]
+	waiting :dict[str | None, collections.deque[FrozenMirror]]
+	threads :list[threading.Thread]
+
+	def __init__(self, workers :int, per_host :int | None = None) -> None: ...
+
+	def __enter__(self) -> 'MirrorTesterPool': ...
+
+	def __exit__(self, *args :typing.Any) -> None: ...
+
+	def _work(self) -> None: ...
+
+	def _next(self, url :str) -> FrozenMirror | None: ...
+
+	def _result(self, completed :tuple[str, results.Result]) -> Result: ...
+
+	def submit(self, frozen_mirror :FrozenMirror) -> None: ...
+
+	def finished(self, timeout :float = 0) -> typing.Iterator[Result]: ...
+
+	def results(self, deadline :float | None = None) -> typing.Iterator[Result]: ...
+
+	def cancel(self) -> list[str]: ...
+
+	def close(self) -> None: ...
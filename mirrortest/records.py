@@ -0,0 +1,112 @@
+import contextlib
+import datetime
+import urllib.error
+
+
+class InvalidTimestamp(ValueError):
+	"""
+	A /lastsync or /lastupdate that isn't a unix time
+	"""
+
+
+def timestamp(data):
+	"""
+	Parses a raw /lastsync or /lastupdate response, an empty one is None
+	"""
+	if isinstance(data, bytes):
+		if not (stamp := data.strip()):
+			return None
+
+		try:
+			return datetime.datetime.fromtimestamp(int(stamp))
+		except (ValueError, OverflowError, OSError) as error:
+			raise InvalidTimestamp(f"Invalid timestamp {stamp[:32]!r}: {error}")
+
+	return data
+
+
+@contextlib.contextmanager
+def still_down():
+	"""
+	Fails a recheck of a mirror that doesn't answer as still down, keeping
+	the kind of error. Any HTTP answer at all means the mirror is up again.
+	"""
+	try:
+		yield
+	except urllib.error.HTTPError:
+		pass
+	except urllib.error.URLError as error:
+		raise urllib.error.URLError(f"still down: {error.reason}")
+	except TimeoutError as error:
+		raise TimeoutError(f"still down: {error}")
+
+
+class MirrorRecord:
+	"""
+	A lightweight stand-in for models.MirrorTester when testing all mirrors.
+	Constructing one does no requests and no validation, fetching is the separate
+	fetch() step and the URLs (from the mirrorlist) and the Tier0 are only validated
+	once, where they come in. It has the same attributes as a MirrorTester, so .valid,
+	results.drift() and the repodb functions all work the same on either.
+	"""
+	__slots__ = ('url', 'tier', 'tier_0', 'last_sync', 'last_update', 'verify_db', 'timeout', 'arch', 'packages_behind')
+
+	def __init__(self, url, tier, tier_0, last_sync, last_update, verify_db=False, timeout=None, arch='x86_64'):
+		# Same as models.Mirror.validate_url()
+		self.url = (url if url.startswith('http') else f"https://{url}").rstrip('/')
+		self.tier = tier
+		self.tier_0 = tier_0
+		self.last_sync = timestamp(last_sync)
+		self.last_update = timestamp(last_update)
+		self.verify_db = verify_db
+		self.timeout = timeout
+		self.arch = arch
+		self.packages_behind = None
+
+	@classmethod
+	def fetch(cls, url, tier, tier_0, verify_db=False, timeout=None, hedge=None):
+		"""
+		Requests /lastsync (hedged after `hedge` seconds, see MirrorTester.request_times())
+		and /lastupdate of a mirror and returns its MirrorRecord
+		"""
+		from .models import MirrorTester
+
+		last_sync, last_update = MirrorTester.request_times(url, timeout, hedge)
+
+		return cls(url, tier, tier_0, last_sync, last_update, verify_db, timeout)
+
+	@classmethod
+	def recheck(cls, url, tier, tier_0, verify_db=False, timeout=None, deadline=None):
+		"""
+		fetch() for a mirror on a host that has been down for a while (see database.breakers()),
+		which first requests /lastsync alone within `deadline` seconds and fails as still down
+		without going any further if that doesn't get an answer.
+		"""
+		from .models import MirrorTester
+
+		with still_down():
+			MirrorTester.request(url, '/lastsync', deadline)
+
+		return cls.fetch(url, tier, tier_0, verify_db, timeout)
+
+	# MirrorTester's methods only use attributes we have as well
+	def get_db(self, repo):
+		from .models import MirrorTester
+
+		return MirrorTester.get_db(self, repo)
+
+	def stream_db(self, repo):
+		from .models import MirrorTester
+
+		return MirrorTester.stream_db(self, repo)
+
+	def head_db(self, repo):
+		from .models import MirrorTester
+
+		return MirrorTester.head_db(self, repo)
+
+	@property
+	def valid(self):
+		from .models import MirrorTester
+
+		return MirrorTester.valid.fget(self)
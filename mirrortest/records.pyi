@@ -0,0 +1,42 @@
+import datetime
+import http.client
+import typing
+
+from .models import Tier0
+
+
+class InvalidTimestamp(ValueError): ...
+
+
+def still_down() -> typing.ContextManager[None]: ...
+
+def timestamp(data :bytes | datetime.datetime | None) -> datetime.datetime | None: ...
+
+
+class MirrorRecord:
+	url :str
+	tier :int
+	tier_0 :Tier0
+	last_sync :datetime.datetime | None
+	last_update :datetime.datetime | None
+	verify_db :bool
+	timeout :float | None
+	arch :str
+	packages_behind :str | None
+
+	def __init__(self, url :str, tier :int, tier_0 :Tier0, last_sync :bytes | datetime.datetime | None, last_update :bytes | datetime.datetime | None, verify_db :bool = False, timeout :float | None = None, arch :str = 'x86_64') -> None: ...
+
+	@classmethod
+	def fetch(cls, url :str, tier :int, tier_0 :Tier0, verify_db :bool = False, timeout :float | None = None, hedge :float | None = None) -> 'MirrorRecord': ...
+
+	@classmethod
+	def recheck(cls, url :str, tier :int, tier_0 :Tier0, verify_db :bool = False, timeout :float | None = None, deadline :float | None = None) -> 'MirrorRecord': ...
+
+	def get_db(self, repo :str) -> bytes: ...
+
+	def stream_db(self, repo :str) -> typing.ContextManager[http.client.HTTPResponse]: ...
+
+	def head_db(self, repo :str) -> http.client.HTTPMessage: ...
+
+	@property
+	def valid(self) -> bool: ...
@@ -0,0 +1,260 @@
+import bisect
+import functools
+import hashlib
+import tarfile
+import tempfile
+import threading
+import zlib
+
+REPOSITORIES = ('core', 'extra', 'multilib')
+# How much of a database we hold in memory at any given time while streaming it
+CHUNK_SIZE = 64 * 1024
+# Spooled databases larger than this spill over to a temporary file
+SPOOL_SIZE = 4 * 1024 * 1024
+# What reading a database that isn't one raises, gzip.BadGzipFile is an OSError
+UNREADABLE = (tarfile.TarError, EOFError, zlib.error, OSError)
+
+
+def spool():
+	return tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+
+
+def digest(stream, spool=None):
+	"""
+	Reads a streamed database CHUNK_SIZE bytes at a time and returns its
+	(sha256 hexdigest, size). The chunks are also written to `spool`
+	if one is given, for when the database is needed after hashing it.
+	"""
+	hasher = hashlib.sha256()
+	size = 0
+
+	with stream as response:
+		while chunk := response.read(CHUNK_SIZE):
+			hasher.update(chunk)
+			size += len(chunk)
+			if spool is not None:
+				spool.write(chunk)
+
+	return hasher.hexdigest(), size
+
+
+def parse_desc(desc):
+	"""
+	Returns the (name, version, sha256sum) from a package desc file
+	"""
+	fields = {}
+	key = None
+	for line in desc.decode('utf-8', errors='replace').splitlines():
+		if line.startswith('%') and line.endswith('%'):
+			key = line[1:-1]
+		elif line and key and key not in fields:
+			fields[key] = line
+
+	return fields.get('NAME'), fields.get('VERSION', ''), fields.get('SHA256SUM')
+
+
+class PackageIndex:
+	"""
+	A compact index of the packages in a repo database, with the package
+	names sorted in one list, their versions in another and all the
+	sha256 checksums packed back to back in a single bytes object.
+	"""
+	__slots__ = ('names', 'versions', 'checksums')
+
+	def __init__(self, packages):
+		packages = sorted(packages)
+
+		self.names = [name for name, version, checksum in packages]
+		self.versions = [version for name, version, checksum in packages]
+		self.checksums = b''.join(bytes.fromhex(checksum) if checksum else bytes(32) for name, version, checksum in packages)
+
+	@classmethod
+	def from_file(cls, fileobj):
+		"""
+		Builds the index from a (streamed) {repo}.db.tar.gz, reading it front to back
+		"""
+		packages = []
+		with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+			for member in tar:
+				if member.isfile() and member.name.endswith('/desc'):
+					name, version, checksum = parse_desc(tar.extractfile(member).read())
+					if name:
+						packages.append((name, version, checksum))
+
+		return cls(packages)
+
+	def __len__(self):
+		return len(self.names)
+
+	def checksum(self, index):
+		return self.checksums[index * 32:index * 32 + 32]
+
+	def diff(self, tier0):
+		"""
+		Returns (stale, missing), the number of packages in the Tier0 index that
+		this index has another version or checksum of, and the number it lacks entirely.
+		"""
+		stale = 0
+		missing = 0
+		position = 0
+
+		for tier0_position, name in enumerate(tier0.names):
+			position = bisect.bisect_left(self.names, name, position)
+			if position == len(self.names) or self.names[position] != name:
+				missing += 1
+			elif self.versions[position] != tier0.versions[tier0_position] or self.checksum(position) != tier0.checksum(tier0_position):
+				stale += 1
+
+		return stale, missing
+
+
+def metadata(headers):
+	"""
+	Returns the (Content-Length, Last-Modified, ETag) of a database response
+	"""
+	return headers.get('Content-Length'), headers.get('Last-Modified'), headers.get('ETag')
+
+
+def agrees(mirror_metadata, tier0_metadata):
+	"""
+	Databases of the same size, with the same Last-Modified or ETag,
+	are taken to be the same database without downloading them.
+	"""
+	if mirror_metadata is None or tier0_metadata is None:
+		return False
+
+	length, last_modified, etag = mirror_metadata
+	tier0_length, tier0_last_modified, tier0_etag = tier0_metadata
+
+	if length is None or length != tier0_length:
+		return False
+
+	return bool((last_modified and last_modified == tier0_last_modified) or (etag and etag == tier0_etag))
+
+
+def head_metadata(mirror, repo):
+	"""
+	Returns the metadata() of a database from a HEAD request,
+	or None if the mirror would not answer it.
+	"""
+	from .results import ERRORS
+
+	try:
+		return metadata(mirror.head_db(repo))
+	except ERRORS:
+		return None
+
+
+class Tier0Index:
+	"""
+	The digest, PackageIndex and metadata of each Tier0 database, fetched once on
+	first use and then shared by every mirror compared against it (see Tier0.index).
+	"""
+	def __init__(self, tier_0):
+		self.tier_0 = tier_0
+		# One lock per repo, so that fetching one database doesn't hold up
+		# mirrors waiting on another, nor the HEAD requests for metadata.
+		self.locks = {}
+		self.metadata_lock = threading.Lock()
+		self.databases = {}
+		self.failures = {}
+		self.metadata = {}
+
+	def __getitem__(self, repo):
+		"""
+		Returns the (digest, PackageIndex) of a Tier0 database. A database that could
+		not be fetched isn't tried again either, it raises Tier0DatabaseError instead.
+		"""
+		from .results import ERRORS, Tier0DatabaseError
+
+		with self.locks.setdefault(repo, threading.Lock()):
+			if repo not in self.databases and repo not in self.failures:
+				try:
+					with spool() as fh:
+						tier0_digest = digest(self.tier_0.stream_db(repo), spool=fh)
+						fh.seek(0)
+						self.databases[repo] = tier0_digest, PackageIndex.from_file(fh)
+				except (*ERRORS, *UNREADABLE) as error:
+					self.failures[repo] = f"Could not get {repo}.db.tar.gz from the Tier0: {error}"
+
+			if repo in self.failures:
+				raise Tier0DatabaseError(self.failures[repo])
+
+			return self.databases[repo]
+
+	def head(self, repo):
+		"""
+		Returns the metadata() of a Tier0 database
+		"""
+		with self.metadata_lock:
+			if repo not in self.metadata:
+				self.metadata[repo] = head_metadata(self.tier_0, repo)
+
+			return self.metadata[repo]
+
+
+def compare(mirror_tester, repo, tier0_index):
+	"""
+	Returns the (stale, missing) packages of a mirror's database compared to the Tier0.
+	Identical databases are recognized by their digest without parsing them, one
+	that can't be parsed raises DatabaseError.
+	"""
+	from .results import DatabaseError
+
+	tier0_digest, tier0_packages = tier0_index[repo]
+
+	with spool() as fh:
+		if digest(mirror_tester.stream_db(repo), spool=fh) == tier0_digest:
+			return 0, 0
+
+		fh.seek(0)
+		try:
+			return PackageIndex.from_file(fh).diff(tier0_packages)
+		except UNREADABLE as error:
+			raise DatabaseError(f"{repo}.db.tar.gz can't be read: {error}")
+
+
+def unchanged(mirror_tester, tier0_index, repos=REPOSITORIES):
+	"""
+	Sends HEAD requests for all the databases on the mirror and the Tier0 at the
+	same time, and returns the repos whose database metadata agrees between them.
+	"""
+	from .session import configuration
+	from .connections import gather
+
+	repos = list(repos)
+	results = gather(
+		*[functools.partial(head_metadata, mirror_tester, repo) for repo in repos],
+		*[functools.partial(tier0_index.head, repo) for repo in repos],
+		timeout=configuration.CON_TIMEOUT
+	)
+
+	return {
+		repo
+		for repo, mirror_metadata, tier0_metadata in zip(repos, results[:len(repos)], results[len(repos):])
+		if agrees(mirror_metadata, tier0_metadata)
+	}
+
+
+def verify(mirror_tester, repos=REPOSITORIES):
+	"""
+	Compares the databases of a mirror with the ones on the Tier0
+	and returns {repo: (stale, missing)}. Only the databases whose
+	HEAD metadata disagrees with the Tier0 are downloaded.
+	"""
+	tier0_index = mirror_tester.tier_0.index
+	agreeing = unchanged(mirror_tester, tier0_index, repos)
+
+	return {repo: (0, 0) if repo in agreeing else compare(mirror_tester, repo, tier0_index) for repo in repos}
+
+
+def behind(mirror_tester, repos=REPOSITORIES):
+	"""
+	Returns a summary of the repos in which a mirror has stale
+	or missing packages, or an empty string if it has none.
+	"""
+	return ', '.join(
+		f"{repo}: {stale} stale, {missing} missing"
+		for repo, (stale, missing) in verify(mirror_tester, repos).items()
+		if stale or missing
+	)
@@ -0,0 +1,72 @@
+import http.client
+import tempfile
+import threading
+import typing
+
+from .models import MirrorTester, Tier0
+from .records import MirrorRecord
+
+REPOSITORIES :tuple[str, ...]
+CHUNK_SIZE :int
+SPOOL_SIZE :int
+UNREADABLE :tuple[type[Exception], ...]
+
+Digest = tuple[str, int]
+
+
+def spool() -> tempfile.SpooledTemporaryFile[bytes]: ...
+
+def digest(stream :typing.ContextManager[http.client.HTTPResponse], spool :typing.IO[bytes] | None = None) -> Digest: ...
+
+def parse_desc(desc :bytes) -> tuple[str | None, str, str | None]: ...
+
+
+class PackageIndex:
+	names :list[str]
+	versions :list[str]
+	checksums :bytes
+
+	def __init__(self, packages :typing.Iterable[tuple[str, str, str | None]]) -> None: ...
+
+	@classmethod
+	def from_file(cls, fileobj :typing.IO[bytes]) -> 'PackageIndex': ...
+
+	def __len__(self) -> int: ...
+
+	def checksum(self, index :int) -> bytes: ...
+
+	def diff(self, tier0 :'PackageIndex') -> tuple[int, int]: ...
+
+
+Metadata = tuple[str | None, str | None, str | None]
+
+
+def metadata(headers :typing.Mapping[str, str]) -> Metadata: ...
+
+def agrees(mirror_metadata :Metadata | None, tier0_metadata :Metadata | None) -> bool: ...
+
+def head_metadata(mirror :Tier0 | MirrorTester | MirrorRecord, repo :str) -> Metadata | None: ...
+
+
+class Tier0Index:
+	tier_0 :Tier0
+	locks :dict[str, threading.Lock]
+	metadata_lock :threading.Lock
+	databases :dict[str, tuple[Digest, PackageIndex]]
+	failures :dict[str, str]
+	metadata :dict[str, Metadata | None]
+
+	def __init__(self, tier_0 :Tier0) -> None: ...
+
+	def __getitem__(self, repo :str) -> tuple[Digest, PackageIndex]: ...
+
+	def head(self, repo :str) -> Metadata | None: ...
+
+
+def compare(mirror_tester :MirrorTester | MirrorRecord, repo :str, tier0_index :Tier0Index) -> tuple[int, int]: ...
+
+def unchanged(mirror_tester :MirrorTester | MirrorRecord, tier0_index :Tier0Index, repos :typing.Iterable[str] = REPOSITORIES) -> set[str]: ...
+
+def verify(mirror_tester :MirrorTester | MirrorRecord, repos :typing.Iterable[str] = REPOSITORIES) -> dict[str, tuple[int, int]]: ...
+
+def behind(mirror_tester :MirrorTester | MirrorRecord, repos :typing.Iterable[str] = REPOSITORIES) -> str: ...
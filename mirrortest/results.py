@@ -0,0 +1,101 @@
+import urllib.error
+import datetime
+import pydantic
+
+from .records import InvalidTimestamp
+
+
+class DatabaseError(Exception):
+	"""
+	A package database of a mirror that isn't one, an HTML error page or one cut short for instance
+	"""
+
+
+class Tier0DatabaseError(Exception):
+	"""
+	A package database of the Tier0 that could not be fetched or read, which no mirror can be compared against
+	"""
+
+
+# The negative time_delta_int values written to the logs when a mirror
+# could not be compared against the Tier0. The order matters, as
+# urllib.error.HTTPError is a subclass of urllib.error.URLError.
+# An unparsable timestamp of a records.MirrorRecord is the
+# pydantic.ValidationError of a MirrorTester.
+ERROR_CODES = (
+	(urllib.error.HTTPError, -1),
+	(urllib.error.URLError, -2),
+	(TimeoutError, -3),
+	(pydantic.ValidationError, -4),
+	(InvalidTimestamp, -4),
+	(DatabaseError, -10),
+	(Tier0DatabaseError, -11),
+)
+ERRORS = tuple(error_type for error_type, code in ERROR_CODES)
+# The time_delta_int of a mirror that was still being tested when the --deadline of the scan passed
+DEADLINE_CODE = -8
+# The time_delta_int of a mirror whose test raised an error we don't expect (see crashed())
+CRASHED_CODE = -9
+# The (last_sync, last_update) of a mirror that couldn't be fetched
+NO_TIMES = (None, None)
+
+
+def error_code(error):
+	"""
+	Returns the time_delta_int result code for a known error
+	raised while testing a mirror.
+	"""
+	for error_type, code in ERROR_CODES:
+		if isinstance(error, error_type):
+			return code
+
+	raise ValueError(f"No result code for {type(error)}")  # pragma: no cover
+
+
+def crashed(error):
+	"""
+	Returns the failed (good_exit, time_delta_int, time_delta_str, timings, times) result
+	of a mirror whose test raised an unexpected `error`, so that it fails that mirror
+	rather than the whole scan.
+	"""
+	return False, CRASHED_CODE, f"{type(error).__name__}: {error}", [], NO_TIMES
+
+
+def drift(mirror_tester):
+	"""
+	Returns the (time_delta_int, time_delta_str) result of how
+	far behind the Tier0 a given MirrorTester (or MirrorRecord) is.
+	"""
+	if (last_update := mirror_tester.last_update) and (tier0_last_update := mirror_tester.tier_0.last_update):
+		time_delta = tier0_last_update - last_update
+		if type(time_delta) == datetime.timedelta:
+			return time_delta.total_seconds(), time_delta
+		else:  # pragma: no cover
+			return -5, time_delta
+
+	return -6, 'Could not find /lastupdate on mirror'  # pragma: no cover
+
+
+def evaluate(frozen_mirror):
+	"""
+	Instanciates a frozen (functools.partial) MirrorTester or MirrorRecord and returns
+	the (good_exit, time_delta_int, time_delta_str, timings, times) result for it,
+	where timings are the connections.Timing of every request that was made and
+	times the (last_sync, last_update) of the mirror, (None, None) if it has none.
+	"""
+	from .connections import trace
+
+	with trace() as timings:
+		try:
+			mirror_tester = frozen_mirror()
+			times = (mirror_tester.last_sync, mirror_tester.last_update)
+			good_exit = mirror_tester.valid
+			time_delta_int, time_delta_str = drift(mirror_tester)
+
+			# Up to date timestamps, but stale or missing packages (see MirrorTester.verify_db)
+			if mirror_tester.packages_behind:
+				return False, -7, mirror_tester.packages_behind, timings, times
+		except ERRORS as error:  # pragma: no cover
+			return False, error_code(error), str(error), timings, NO_TIMES
+
+	return good_exit, time_delta_int, time_delta_str, timings, times
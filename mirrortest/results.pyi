@@ -0,0 +1,29 @@
+import datetime
+import functools
+
+from .connections import Timing
+from .models import MirrorTester
+from .records import MirrorRecord
+
+class DatabaseError(Exception): ...
+
+
+class Tier0DatabaseError(Exception): ...
+
+
+ERROR_CODES :tuple[tuple[type[Exception], int], ...]
+ERRORS :tuple[type[Exception], ...]
+DEADLINE_CODE :int
+Times = tuple[datetime.datetime | None, datetime.datetime | None]
+NO_TIMES :Times
+Result = tuple[bool, float, datetime.timedelta | str, list[Timing], Times]
+CRASHED_CODE :int
+
+
+def error_code(error :Exception) -> int: ...
+
+def crashed(error :Exception) -> Result: ...
+
+def drift(mirror_tester :MirrorTester | MirrorRecord) -> tuple[float, datetime.timedelta | str]: ...
+
+def evaluate(frozen_mirror :functools.partial[MirrorTester] | functools.partial[MirrorRecord]) -> Result: ...
@@ -0,0 +1,167 @@
+import functools
+import heapq
+import random
+import threading
+import time
+
+# A mirror that fails or drifts is rechecked after MIN_INTERVAL seconds,
+# every stable check after that doubles its interval up until MAX_INTERVAL.
+MIN_INTERVAL = 120
+MAX_INTERVAL = 3600
+# How often --daemon fetches the mirrorlist again for added or removed mirrors
+MIRRORLIST_INTERVAL = 3600
+# Intervals are spread by this fraction, so mirrors added together don't stay in lockstep
+JITTER = 0.1
+
+
+class Scheduler:
+	"""
+	Keeps every mirror on its own rescan interval in a priority queue
+	ordered by when each mirror is due next.
+	"""
+	def __init__(self, drift, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, clock=time.monotonic):
+		self.drift = drift
+		self.min_interval = min_interval
+		self.max_interval = max_interval
+		self.clock = clock
+		self.queue = []
+		self.intervals = {}
+		# When each queued mirror is due, entries in the queue that don't match are outdated
+		self.due_at = {}
+
+	def __len__(self):
+		return len(self.intervals)
+
+	def _push(self, url, due):
+		self.due_at[url] = due
+		heapq.heappush(self.queue, (due, url))
+
+	def update(self, urls):
+		"""
+		Replaces the mirrors to schedule, new mirrors are due right away
+		and mirrors that are no longer given are dropped.
+		"""
+		urls = set(urls)
+
+		for url in set(self.intervals) - urls:
+			del self.intervals[url]
+			self.due_at.pop(url, None)
+
+		for url in urls - set(self.intervals):
+			self.intervals[url] = self.min_interval
+			self._push(url, self.clock())
+
+	def due(self):
+		"""
+		Yields the mirrors that are due, they are not scheduled
+		again until done() has been called for them.
+		"""
+		while self.queue and self.queue[0][0] <= self.clock():
+			due, url = heapq.heappop(self.queue)
+			if self.due_at.get(url) == due:
+				del self.due_at[url]
+				yield url
+
+	def done(self, url, good_exit, time_delta_int):
+		"""
+		Schedules a mirror again, sooner if it failed or is drifting
+		behind the Tier0 and later the longer it has been stable.
+		"""
+		if url not in self.intervals:
+			return
+
+		if good_exit and 0 <= time_delta_int <= self.drift:
+			self.intervals[url] = min(self.intervals[url] * 2, self.max_interval)
+		else:
+			self.intervals[url] = self.min_interval
+
+		self._push(url, self.clock() + self.intervals[url] * random.uniform(1 - JITTER, 1 + JITTER))
+
+	def defer(self, url, delay):
+		"""
+		Schedules a mirror again in `delay` seconds instead, leaving its interval as it is
+		"""
+		if url in self.intervals:
+			self._push(url, self.clock() + max(delay, 0))
+
+	def next_due(self):
+		"""
+		Returns the clock() time the next mirror is due, or None
+		"""
+		return self.queue[0][0] if self.queue else None
+
+
+def serve(tier_0, workers, callback, mirrorlist, tier=2, verify_db=False, stop=None, learned=None, per_host=None, breakers=None):
+	"""
+	Tests the mirrors returned by mirrorlist() over and over on their own schedule
+	until `stop` (a threading.Event) is set, keeping the Tier0, its package index and the
+	pooled connections around in between. callback(url, good_exit, time_delta_int, time_delta_str, timings, times)
+	is called for each mirror as soon as it has been tested.
+
+	learned() returns (timeouts, hedges) with the learned per host timeouts (see database.timeouts())
+	and the per host /lastsync times after which it's hedged (see database.percentiles()), or None
+	for either, it's called again whenever the mirrorlist is. `per_host` caps how many
+	mirrors on the same host are tested at once (see MirrorTesterPool).
+
+	breakers() returns the hosts that have been down for a while (see database.breakers()),
+	their mirrors are only rechecked once due and otherwise put off until then.
+	"""
+	from .database import BREAKER_CODES, RECHECK, SKIP, breaker, breaker_due, host_timeout
+	from .pool import MirrorTesterPool, host
+	from .records import MirrorRecord
+	from .results import ERRORS
+	from .session import configuration
+
+	stop = stop or threading.Event()
+	# A mirror more than half way to being flagged counts as drifting
+	scheduler = Scheduler((configuration.MAX_TIER2_SYNC_DRIFT_SEC if tier == 2 else configuration.MAX_TIER1_SYNC_DRIFT_SEC) / 2)
+	mirrorlist_due = 0.0
+	timeouts = None
+	hedges = None
+	down = None
+
+	with MirrorTesterPool(workers, per_host) as pool:
+		while not stop.is_set():
+			if time.monotonic() >= mirrorlist_due:
+				try:
+					scheduler.update(mirrorlist())
+				except ERRORS as error:  # pragma: no cover
+					print(f"Could not refresh the mirrorlist, keeping the {len(scheduler)} mirrors we have: {error}")
+				if learned:
+					timeouts, hedges = learned()
+				if breakers:
+					down = breakers()
+				mirrorlist_due = time.monotonic() + MIRRORLIST_INTERVAL
+
+			if due := list(scheduler.due()):
+				try:
+					tier_0.refresh()
+				except ERRORS as error:  # pragma: no cover
+					print(f"Could not refresh the Tier0, comparing against the last known state: {error}")
+
+				for url in due:
+					if (state := breaker(down, url, time.time())) == SKIP:
+						scheduler.defer(url, breaker_due(*down[host(url)]) - time.time())
+					elif state == RECHECK:
+						pool.submit(functools.partial(MirrorRecord.recheck, tier=tier, url=url, tier_0=tier_0, verify_db=verify_db, timeout=host_timeout(timeouts, url), deadline=configuration.CON_TIMEOUT_MIN))
+					else:
+						pool.submit(functools.partial(MirrorRecord.fetch, tier=tier, url=url, tier_0=tier_0, verify_db=verify_db, timeout=host_timeout(timeouts, url), hedge=host_timeout(hedges, url)))
+
+			# Wait for results, but no longer than until the next mirror is due
+			next_due = min(filter(None, (scheduler.next_due(), mirrorlist_due)))
+			timeout = min(max(next_due - time.monotonic(), 0), 1)
+			if not pool.pending:
+				stop.wait(timeout)
+
+			for url, good_exit, time_delta_int, time_delta_str, timings, times in pool.finished(timeout=timeout):
+				callback(url, good_exit, time_delta_int, time_delta_str, timings, times)
+				scheduler.done(url, good_exit, time_delta_int)
+
+				# Keeps backing off a host that is still down until breakers() is called again
+				if down and (name := host(url)) in down:
+					if not good_exit and time_delta_int in BREAKER_CODES:
+						failures, last = down[name]
+						down[name] = (failures + 1, time.time())
+						scheduler.defer(url, breaker_due(*down[name]) - time.time())
+					else:
+						del down[name]
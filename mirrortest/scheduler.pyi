@@ -0,0 +1,41 @@
+import datetime
+import threading
+import typing
+
+from .connections import Timing
+from .models import Tier0
+from .results import Times
+
+MIN_INTERVAL :int
+MAX_INTERVAL :int
+MIRRORLIST_INTERVAL :int
+JITTER :float
+
+
+class Scheduler:
+	drift :float
+	min_interval :float
+	max_interval :float
+	clock :typing.Callable[[], float]
+	queue :list[tuple[float, str]]
+	intervals :dict[str, float]
+	due_at :dict[str, float]
+
+	def __init__(self, drift :float, min_interval :float = MIN_INTERVAL, max_interval :float = MAX_INTERVAL, clock :typing.Callable[[], float] = ...) -> None: ...
+
+	def __len__(self) -> int: ...
+
+	def _push(self, url :str, due :float) -> None: ...
+
+	def update(self, urls :typing.Iterable[str]) -> None: ...
+
+	def due(self) -> typing.Iterator[str]: ...
+
+	def done(self, url :str, good_exit :bool, time_delta_int :float) -> None: ...
+
+	def defer(self, url :str, delay :float) -> None: ...
+
+	def next_due(self) -> float | None: ...
+
+
+def serve(tier_0 :Tier0, workers :int, callback :typing.Callable[[str, bool, float, datetime.timedelta | str, list[Timing], Times], None], mirrorlist :typing.Callable[[], typing.Iterable[str]], tier :int = 2, verify_db :bool = False, stop :threading.Event | None = None, learned :typing.Callable[[], tuple[dict[str, float] | None, dict[str, float] | None]] | None = None, per_host :int | None = None, breakers :typing.Callable[[], dict[str, tuple[int, float]]] | None = None) -> None: ...
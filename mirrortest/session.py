@@ -1,18 +1,48 @@
+import dataclasses
+import threading
 import pathlib
 import json
 import os
 
-from .models import Configuration
+# Guards the creation of the configuration on first use
+configuration_lock = threading.Lock()
 
-# Initiate configuration with default values
-configuration = Configuration()
 
-# Update configuration with stored JSON values (if any)
-if (config := pathlib.Path('~/.config/mirrortester/config.json').expanduser()).exists():  # pragma: no cover
-	with config.open() as fh:
-		json_config = json.load(fh)
+def load():
+	"""
+	Returns the configuration with default values, updated with the
+	stored JSON values and then the environment variables (if any).
+	"""
+	from .models import Configuration
 
-	[setattr(configuration, key, val) for key, val in json_config.items()]  # type: ignore
+	# Initiate configuration with default values
+	configuration = Configuration()
 
-# Update configuration from environment variables (if any)
-[setattr(configuration, key, val) for key, val in os.environ.items()]  # type: ignore
+	# Update configuration with stored JSON values (if any)
+	if (config := pathlib.Path('~/.config/mirrortester/config.json').expanduser()).exists():  # pragma: no cover
+		with config.open() as fh:
+			json_config = json.load(fh)
+
+		[setattr(configuration, key, val) for key, val in json_config.items()]
+
+	# Update configuration from environment variables (if any), only the ones that are settings
+	[setattr(configuration, field.name, os.environ[field.name]) for field in dataclasses.fields(configuration) if field.name in os.environ]
+
+	return configuration
+
+
+def __getattr__(name):
+	"""
+	The configuration is only loaded once something imports it, by
+	which time it's set as a module global and this isn't called again.
+	"""
+	global configuration
+
+	if name != 'configuration':
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+	with configuration_lock:
+		if 'configuration' not in globals():
+			configuration = load()
+
+	return configuration
@@ -0,0 +1,9 @@
+import threading
+
+from .models import Configuration
+
+configuration_lock :threading.Lock
+configuration :Configuration
+
+
+def load() -> Configuration: ...
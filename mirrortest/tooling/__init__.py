@@ -1 +1 @@
-from .cli import args
+from .cli import arguments, run  # noqa: F401
@@ -1,23 +1,43 @@
-import threading
 import datetime
-import functools
 import argparse
+import typing
 
-from ..models import MirrorTester
+from ..binlog import BinaryLog
+from ..connections import Timing
+from ..database import ResultSink
+from ..export import Metrics
+from ..models import Tier0
+from ..results import Times
 
-args :argparse.Namespace
+STATS_DAYS :int
+DAY_ZERO :int
 
 
-class MirrorTesterThreading(threading.Thread):
-	tester :functools.partial[MirrorTester]
-	mirror_tester :MirrorTester | None = None
-	good_exit : bool | None = None
-	time_delta_str : datetime.timedelta | str | None = None
-	time_delta_int : float | None = None
+def shard_type(value :str) -> tuple[int, int]: ...
 
-	def __init__(self, frozen_mirror :functools.partial[MirrorTester]): ...
 
-	def run(self) -> None: ...
+def day_type(value :str) -> int: ...
 
 
-def run() -> None: ...
+def arguments(argv :list[str] | None = None) -> argparse.Namespace: ...
+
+
+def mirrorlist_lines(options :argparse.Namespace) -> typing.Iterator[bytes]: ...
+
+def mirrorlist_urls(lines :typing.Iterable[bytes]) -> typing.Iterator[str]: ...
+
+def shard(urls :typing.Iterable[str], index :int, count :int) -> typing.Iterator[str]: ...
+
+def stdout_stream() -> typing.ContextManager[typing.TextIO]: ...
+
+def log_result(sink :ResultSink, log :typing.TextIO | None, binary :BinaryLog | None, stream :typing.TextIO | None, metrics :Metrics | None, url :str, good_exit :bool | None, time_delta_int :float, time_delta_str :datetime.timedelta | str, timings :list[Timing], times :Times) -> None: ...
+
+def learned_latencies(hedge :bool = False) -> tuple[dict[str, float], dict[str, float] | None]: ...
+
+def learned_breakers() -> dict[str, tuple[int, float]]: ...
+
+def scan(options :argparse.Namespace, tier_0 :Tier0, urls :typing.Iterable[str], index :int = 0, count :int = 1, path :str = 'results.db') -> None: ...
+
+def scan_process(options :argparse.Namespace, settings :dict[str, typing.Any], urls :list[str], index :int, count :int, path :str) -> None: ...
+
+def run(argv :list[str] | None = None) -> None: ...
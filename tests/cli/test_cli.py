@@ -49,6 +49,61 @@ def test_cli_single_HTTPError():
 
 	mirrortest.tooling.cli.run()
 
+def test_cli_single_tier0_down(capsys):
+	import urllib.error
+	import mirrortest.tooling.cli
+
+	# A Tier0 that can't be reached is not blamed on the mirror
+	with pytest.raises(urllib.error.URLError):
+		mirrortest.tooling.cli.run(['--mirror', 'https://mirror.example.org', '--tier0', 'http://127.0.0.1:1/$repo/os/$arch'])
+
+	assert "Your mirror" not in capsys.readouterr().out
+
+def test_mirrorlist_urls():
+	import io
+	from mirrortest.tooling.cli import mirrorlist_urls
+
+	mirrorlist = io.BytesIO(
+		b'## Worldwide\n'
+		b'#Server = https://geo.mirror.pkgbuild.com/$repo/os/$arch\n'
+		b'\n'
+		b'## Sweden\n'
+		b'#Server = http://ftp.acc.umu.se/mirror/archlinux/$repo/os/$arch\n'
+		b'#Server = https://geo.mirror.pkgbuild.com/$repo/os/$arch\n'
+		b'#Server = https://ftp.acc.umu.se/mirror/archlinux/$repo/os/$arch'
+	)
+
+	# Duplicates are left out as they come
+	assert list(mirrorlist_urls(mirrorlist)) == ['https://geo.mirror.pkgbuild.com', 'http://ftp.acc.umu.se/mirror/archlinux', 'https://ftp.acc.umu.se/mirror/archlinux']
+
+def test_stdout_stream(capfd):
+	from mirrortest.tooling.cli import stdout_stream
+
+	# Only the JSON lines end up on stdout
+	with stdout_stream() as stream:
+		print("mirror is out of sync")
+		stream.write('{"good": true}\n')
+
+	captured = capfd.readouterr()
+	assert captured.out == '{"good": true}\n'
+	assert captured.err == "mirror is out of sync\n"
+
+def test_cli_processes_conflicts(capsys):
+	from mirrortest.tooling.cli import arguments
+
+	tier0 = ['--mirror', '*', '--tier0', 'https://geo.mirror.pkgbuild.com/$repo/os/$arch', '--processes', '2']
+	assert arguments(tier0 + ['--jsonl', '-']).jsonl == '-'
+
+	# Each process would overwrite the others' results
+	with pytest.raises(SystemExit):
+		arguments(tier0 + ['--jsonl', 'results.jsonl'])
+	assert "--jsonl can't be combined with --processes" in capsys.readouterr().err
+
+	# results.db would never see the shards of a daemon
+	with pytest.raises(SystemExit):
+		arguments(tier0 + ['--daemon'])
+	assert "--daemon can't be combined with --processes" in capsys.readouterr().err
+
 def test_cli_parse():
 	sys.argv = original_argv + ['--parse']
 
@@ -0,0 +1,89 @@
+import pytest
+import threading
+import time
+import io
+import hashlib
+import tarfile
+import http.server
+
+
+def make_db(packages):
+	"""
+	Builds a {repo}.db.tar.gz the way repo-add does, from {name: version}
+	"""
+	data = io.BytesIO()
+	with tarfile.open(fileobj=data, mode='w:gz') as tar:
+		for name, version in packages.items():
+			desc = f"%FILENAME%\n{name}-{version}-x86_64.pkg.tar.zst\n\n%NAME%\n{name}\n\n%VERSION%\n{version}\n\n%SHA256SUM%\n{hashlib.sha256(f'{name}-{version}'.encode()).hexdigest()}\n\n".encode()
+			info = tarfile.TarInfo(f"{name}-{version}/desc")
+			info.size = len(desc)
+			tar.addfile(info, io.BytesIO(desc))
+
+	return data.getvalue()
+
+
+class LocalMirror(http.server.BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+	timestamp = int(time.time())
+	databases = {}
+
+	def do_GET(self):
+		if self.path.startswith('/redirect/'):
+			self.send_response(301)
+			self.send_header('Location', self.path[len('/redirect'):])
+			self.send_header('Content-Length', '0')
+			self.end_headers()
+		elif self.path in ('/lastsync', '/lastupdate'):
+			self.server.hits += 1
+			if self.headers.get('If-None-Match') == f'"{self.timestamp}"':
+				self.send_response(304)
+				self.end_headers()
+				return
+
+			body = f"{self.timestamp}\n".encode()
+			self.send_response(200)
+			self.send_header('ETag', f'"{self.timestamp}"')
+			self.send_header('Content-Length', str(len(body)))
+			self.end_headers()
+			self.wfile.write(body)
+		elif self.path in self.databases:
+			self.server.hits += 1
+			self.do_HEAD()
+			self.wfile.write(self.databases[self.path])
+		else:
+			self.send_error(404)
+
+	def do_HEAD(self):
+		if self.path not in self.databases:
+			self.send_error(404)
+			return
+
+		self.send_response(200)
+		self.send_header('Content-Length', str(len(self.databases[self.path])))
+		self.send_header('Last-Modified', 'Mon, 13 Mar 2023 10:00:00 GMT')
+		self.end_headers()
+
+	def log_message(self, *args):
+		pass
+
+
+@pytest.fixture
+def local_server():
+	server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), LocalMirror)
+	server.hits = 0
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	server.url = f"http://127.0.0.1:{server.server_address[1]}"
+	yield server
+	server.shutdown()
+
+
+@pytest.fixture
+def local_mirror(local_server):
+	return local_server.url
+
+
+@pytest.fixture
+def local_tier0(local_mirror):
+	from mirrortest.models import Tier0
+
+	return Tier0(url=local_mirror, last_sync=b'0', last_update=str(LocalMirror.timestamp).encode())
@@ -0,0 +1,41 @@
+import pytest
+import datetime
+import struct
+
+def test_binlog(tmp_path):
+	from mirrortest.binlog import BinaryLog, read
+	from mirrortest.database import connect, ingest
+
+	path = str(tmp_path / 'output_1678652848.097852.rlog')
+
+	with BinaryLog(path) as log:
+		log.write(1678652796.0924394, 'http://mirror.reisenbauer.ee/archlinux', -2, '<urlopen error [Errno -5] No address associated with hostname>')
+		log.write(1678652796.2621465, 'http://archlinux.mirror.colo-serv.net', -2, '<urlopen error [Errno -5] No address associated with hostname>')
+		log.write(1678652796.3114855, 'http://mirror.easyname.at/archlinux', 75474.0, datetime.timedelta(seconds=75474))
+
+	columns, urls, messages = read(path)
+	assert list(columns['code']) == [-2, -2, 0]
+	assert list(columns['url_id']) == [0, 1, 2]
+	# The same message is only stored once, and a drift needs none at all
+	assert messages == ['<urlopen error [Errno -5] No address associated with hostname>']
+
+	con = connect(str(tmp_path / 'results.db'))
+	assert ingest(con, [path]) == 3
+	assert ingest(con, [path]) == 0
+
+	# A row that's only partly written is left for later
+	with BinaryLog(path) as log:
+		log.write(1678652796.3470361, 'http://mirror.easyname.at/archlinux', 904879.0, datetime.timedelta(seconds=904879))
+	with open(tmp_path / 'output_1678652848.097852.rlog' / 'unix_time', 'ab') as fh:
+		fh.write(b'\0' * 8)
+	assert ingest(con, [path]) == 1
+
+	# Which is read once the rest of it is written
+	for name, typecode, value in (('url_id', 'I', 1), ('code', 'b', 0), ('seconds', 'd', 0), ('message_id', 'I', 0xFFFFFFFF)):
+		with open(tmp_path / 'output_1678652848.097852.rlog' / name, 'ab') as fh:
+			fh.write(struct.pack(f'={typecode}', value))
+	assert ingest(con, [path]) == 1
+
+	assert con.execute("SELECT seconds, message FROM results WHERE url = 'http://mirror.reisenbauer.ee/archlinux'").fetchone() == (-2, '<urlopen error [Errno -5] No address associated with hostname>')
+	assert con.execute("SELECT seconds, message FROM results WHERE unix_time = 1678652796.3470361").fetchone() == (904879, '10 days, 11:21:19')
+	con.close()
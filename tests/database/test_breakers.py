@@ -0,0 +1,44 @@
+import pytest
+import functools
+
+def test_breakers(tmp_path):
+	from mirrortest.database import BREAKER_INTERVAL_MAX, BREAKER_INTERVAL_MIN, RECHECK, SKIP, ResultSink, breaker, breaker_due, breakers, connect
+
+	path = str(tmp_path / 'results.db')
+
+	with ResultSink(path) as sink:
+		for index in range(8):
+			# Down for good, down along with another mirror on the host, down while another one is up, up again and flaky
+			sink.probe((1678652796 + index, 'http://dead.lan', False, -3 if index % 2 else -2, []))
+			sink.probe((1678652796 + index, 'http://gone.lan', False, -2, []))
+			sink.probe((1678652796 + index, 'http://gone.lan/archlinux', False, -2, []) if index >= 2 else (1678652796 + index, 'http://gone.lan/archlinux', True, 0, []))
+			sink.probe((1678652796 + index, 'http://half.lan', False, -2, []))
+			sink.probe((1678652796 + index, 'http://half.lan/archlinux', False, -2, []) if index >= 6 else (1678652796 + index, 'http://half.lan/archlinux', True, 0, []))
+			sink.probe((1678652796 + index, 'http://recovered.lan', index >= 4, 0 if index >= 4 else -2, []))
+			sink.probe((1678652796 + index, 'http://flaky.lan', False, -2 if index % 3 else -1, []))
+
+	con = connect(path)
+	tripped = breakers(con, 0)
+	con.close()
+
+	# Every mirror on a host has to be on a streak and the shortest one counts, any other result breaks a streak
+	assert tripped == {'dead.lan': (8, 1678652803), 'gone.lan': (6, 1678652803)}
+
+	assert breaker_due(5, 1000) == 1000 + BREAKER_INTERVAL_MIN
+	assert breaker_due(6, 1000) == 1000 + BREAKER_INTERVAL_MIN * 2
+	assert breaker_due(100, 1000) == 1000 + BREAKER_INTERVAL_MAX
+
+	due = breaker_due(*tripped['dead.lan'])
+	assert breaker(tripped, 'https://dead.lan/somewhere/else', due - 1) == SKIP
+	assert breaker(tripped, 'http://dead.lan', due) == RECHECK
+	assert breaker(tripped, 'http://recovered.lan', due) is None
+	assert breaker(None, 'http://dead.lan', due) is None
+
+def test_recheck(local_tier0):
+	from mirrortest.records import MirrorRecord
+	from mirrortest.results import evaluate
+
+	good_exit, time_delta_int, time_delta_str, timings, times = evaluate(functools.partial(MirrorRecord.recheck, tier=2, url='http://127.0.0.1:1', tier_0=local_tier0, deadline=1))
+
+	assert (good_exit, time_delta_int) == (False, -2)
+	assert 'still down' in str(time_delta_str)
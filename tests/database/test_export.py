@@ -0,0 +1,50 @@
+import pytest
+import datetime
+import json
+
+def test_json_line():
+	from mirrortest.connections import Timing
+	from mirrortest.export import json_line
+
+	line = json_line(1678652796.0, 'http://near.lan', 2, True, 120.0, datetime.timedelta(seconds=120), [Timing('http://near.lan/lastsync', 0.0, 0.01, 0.0, 0.02, 0.03)], (datetime.datetime.fromtimestamp(1678652700), datetime.datetime.fromtimestamp(1678652676)))
+	assert line.endswith('\n')
+
+	result = json.loads(line)
+	assert (result['code'], result['drift'], result['message']) == (0, 120.0, '0:02:00')
+	assert (result['last_sync'], result['last_update']) == (1678652700, 1678652676)
+	assert result['timings'] == [{'url': 'http://near.lan/lastsync', 'dns': 0.0, 'connect': 0.01, 'tls': 0.0, 'ttfb': 0.02, 'total': 0.03}]
+
+	result = json.loads(json_line(1678652796.0, 'http://broken.lan', 2, False, -2, 'Connection refused', [], (None, None)))
+	assert (result['good'], result['code'], result['drift'], result['last_sync']) == (False, -2, None, None)
+
+def test_metrics():
+	import urllib.error
+	import urllib.request
+	from mirrortest.connections import Timing
+	from mirrortest.export import Metrics
+
+	with Metrics(0, '127.0.0.1') as metrics:
+		metrics.observe('http://near.lan', True, 120.0, datetime.timedelta(seconds=120), [Timing('http://near.lan/lastsync', 0, 0, 0, 0.2, 0.3)], (datetime.datetime.fromtimestamp(1678652700), None))
+		metrics.observe('http://broken.lan/"quoted"', False, -2, 'Connection refused', [], (None, None))
+		metrics.observe('http://broken.lan/"quoted"', False, -2, 'Connection refused', [], (None, None))
+
+		url = f"http://127.0.0.1:{metrics.server.server_address[1]}"
+		with urllib.request.urlopen(f"{url}/metrics") as response:
+			assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+			lines = response.read().decode().splitlines()
+
+		with pytest.raises(urllib.error.HTTPError):
+			urllib.request.urlopen(f"{url}/")
+
+	assert 'mirrortest_mirror_up{url="http://near.lan"} 1.0' in lines
+	assert 'mirrortest_mirror_up{url="http://broken.lan/\\"quoted\\""} 0.0' in lines
+	assert 'mirrortest_mirror_drift_seconds{url="http://near.lan"} 120.0' in lines
+	assert 'mirrortest_mirror_last_sync_timestamp_seconds{url="http://near.lan"} 1678652700.0' in lines
+	# Only the gauges a mirror has a value for
+	assert not any(line.startswith('mirrortest_mirror_last_update_timestamp_seconds{') for line in lines)
+	assert 'mirrortest_probes_total{good="false",code="-2"} 2' in lines
+	assert 'mirrortest_probes_total{good="true",code="0"} 1' in lines
+	assert 'mirrortest_probe_latency_seconds_bucket{le="0.25"} 0' in lines
+	assert 'mirrortest_probe_latency_seconds_bucket{le="0.5"} 1' in lines
+	assert 'mirrortest_probe_latency_seconds_count 1' in lines
+	assert 'mirrortest_drift_seconds_bucket{le="+Inf"} 1' in lines
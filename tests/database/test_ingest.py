@@ -0,0 +1,32 @@
+import pytest
+
+test_data = ''
+test_data += '1678652796.0924394,http://mirror.reisenbauer.ee/archlinux,-2,"<urlopen error [Errno -5] No address associated with hostname>"\n'
+test_data += '1678652796.2621465,http://archlinux.mirror.colo-serv.net,-2,"<urlopen error [Errno -2] Name or service not known>"\n'
+test_data += '1678652796.3114855,http://mirror.easyname.at/archlinux,75474.0,"20:57:54"\n'
+
+def test_ingest(tmp_path):
+	from mirrortest.database import connect, ingest
+
+	log = tmp_path / 'output_1678652848.097852.log'
+	log.write_text(test_data)
+
+	con = connect(str(tmp_path / 'results.db'))
+	assert ingest(con, [str(log)]) == 3
+
+	# Nothing new, so nothing should be read again
+	assert ingest(con, [str(log)]) == 0
+
+	# Only the appended row should be read, and a half written row left for later
+	with log.open('a') as fh:
+		fh.write('1678652796.3470361,http://archlinux.mirror.kangaroot.net,904879.0,"10 days, 11:21:19"\n')
+		fh.write('1678652796.3646152,http://mirrors.netix')
+	assert ingest(con, [str(log)]) == 1
+
+	with log.open('a') as fh:
+		fh.write('.net/archlinux,13515.0,"3:45:15"\n')
+	assert ingest(con, [str(log)]) == 1
+
+	assert con.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 5
+	assert con.execute("SELECT seconds FROM results WHERE url = 'http://mirrors.netix.net/archlinux'").fetchone()[0] == 13515
+	con.close()
@@ -0,0 +1,28 @@
+import pytest
+
+def test_merge(tmp_path):
+	from mirrortest.connections import Timing
+	from mirrortest.database import ResultSink, connect, merge, unpack_timings
+
+	shards = [str(tmp_path / f'shard{index}.db') for index in range(2)]
+
+	with ResultSink(shards[0]) as sink:
+		sink.probe((1678652796.1, 'http://a.lan', True, 0, [Timing('http://a.lan/lastupdate', 0.1, 0.2, 0.3, 0.4, 0.5)]))
+
+	with ResultSink(shards[1]) as sink:
+		sink.probe((1678652796.2, 'http://b.lan', True, 0, [Timing('http://b.lan/lastsync', 0, 0, 0, 1, 1), Timing('http://b.lan/lastupdate', 0, 0, 0, 2, 2)]))
+		sink.probe((1678652796.3, 'http://c.lan', False, -2, []))
+		sink.put((1678652796.3, 'http://c.lan', -2, 'Name or service not known'))
+
+	con = connect(str(tmp_path / 'results.db'))
+	assert merge(con, shards) == 4
+	# Merging the same shards again adds nothing
+	assert merge(con, shards) == 0
+
+	assert con.execute("SELECT url, message FROM results").fetchall() == [('http://c.lan', 'Name or service not known')]
+
+	timings = {url: unpack_timings(con, blob) for url, blob in con.execute("SELECT urls.url, probes.timings FROM probes JOIN urls ON urls.id = probes.url_id")}
+	assert [path for path, *phases in timings['http://a.lan']] == ['/lastupdate']
+	assert [(path, total) for path, dns, connect, tls, ttfb, total in timings['http://b.lan']] == [('/lastsync', 1), ('/lastupdate', 2)]
+	assert timings['http://c.lan'] == []
+	con.close()
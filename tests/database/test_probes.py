@@ -0,0 +1,24 @@
+import pytest
+import functools
+
+def test_probes(tmp_path, local_mirror, local_tier0):
+	from mirrortest.database import ResultSink, connect, ranking, unpack_timings
+	from mirrortest.models import MirrorTester
+	from mirrortest.results import evaluate
+
+	path = str(tmp_path / 'results.db')
+	good_exit, time_delta_int, time_delta_str, timings, times = evaluate(functools.partial(MirrorTester, tier=2, url=local_mirror, tier_0=local_tier0))
+
+	assert sorted(timing.url for timing in timings) == [f"{local_mirror}/lastsync", f"{local_mirror}/lastupdate"]
+	assert all(timing.total >= timing.ttfb >= 0 for timing in timings)
+
+	with ResultSink(path) as sink:
+		sink.probe((1678652796.09, local_mirror, good_exit, time_delta_int, timings))
+		sink.probe((1678652796.26, 'http://broken.lan', False, -2, []))
+
+	con = connect(path)
+	(blob,) = con.execute("SELECT timings FROM probes JOIN urls ON urls.id = probes.url_id WHERE urls.url = ?", (local_mirror,)).fetchone()
+
+	assert sorted(path for path, *phases in unpack_timings(con, blob)) == ['/lastsync', '/lastupdate']
+	assert [(url, probes) for url, probes, latency, seconds in ranking(con, 0)] == [(local_mirror, 1)]
+	con.close()
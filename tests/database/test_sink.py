@@ -0,0 +1,36 @@
+import pytest
+import time
+
+def test_result_sink(tmp_path):
+	from mirrortest.database import ResultSink, connect
+
+	path = str(tmp_path / 'results.db')
+	con = connect(path)
+
+	with ResultSink(path, batch_rows=2, batch_seconds=60) as sink:
+		sink.put((1678652796.09, 'http://broken.lan', -2, 'first'))
+		sink.put((1678652796.26, 'http://broken.lan', -2, 'second'))
+
+		# A full batch is committed right away and visible while the scan goes on
+		for _ in range(100):
+			if con.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 2:
+				break
+			time.sleep(0.01)
+		assert con.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 2
+
+		sink.put((1678652796.31, 'http://broken.lan', -2, 'third'))
+
+	# And whatever is left is committed on close
+	assert con.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 3
+	con.close()
+
+def test_result_sink_error(tmp_path):
+	import sqlite3
+	from mirrortest.database import ResultSink
+
+	# The results not making it into the database fails the scan once it's done
+	sink = ResultSink(str(tmp_path / 'missing' / 'results.db'))
+	sink.put((1678652796.09, 'http://broken.lan', -2, 'first'))
+
+	with pytest.raises(sqlite3.OperationalError):
+		sink.close()
@@ -0,0 +1,55 @@
+import pytest
+import time
+
+def test_proof(tmp_path):
+	from mirrortest.database import connect, proof
+
+	now = time.time()
+	con = connect(str(tmp_path / 'results.db'))
+	with con:
+		con.executemany("INSERT INTO results (unix_time, url, seconds, message) VALUES (?, ?, ?, ?)", [
+			(now - 60, 'http://broken.lan', -2, 'third'),
+			(now - 120, 'http://broken.lan', -2, 'second'),
+			(now - 180, 'http://broken.lan', -2, 'first'),
+			(now - 86400 * 30, 'http://broken.lan', -2, 'too old'),
+			(now - 60, 'http://flaky.lan', -3, 'timed out'),
+		])
+
+	assert [message for message, in proof(con, 'http://broken.lan', now - 86400 * 10)] == ['first', 'second', 'third']
+	con.close()
+
+def test_reliability(tmp_path):
+	from mirrortest.database import breakdown, connect, ingest, reliability, rollup
+
+	path = str(tmp_path / 'results.db')
+	con = connect(path)
+	with con:
+		con.executemany("INSERT INTO results (unix_time, url, seconds, message) VALUES (?, ?, ?, ?)", [
+			(86400 * 100 + 60, 'http://broken.lan', -2, 'first'),
+			(86400 * 100 + 120, 'http://broken.lan', -2, 'second'),
+			(86400 * 101 + 60, 'http://broken.lan', 7200, '2:00:00'),
+			(86400 * 102 + 60, 'http://broken.lan', 3600, '1:00:00'),
+			(86400 * 300, 'http://broken.lan', -3, 'much later'),
+			(86400 * 100, 'http://flaky.lan', -3, 'timed out'),
+		])
+
+	assert rollup(con) == 6
+	assert rollup(con) == 0
+	assert reliability(con, 100, 102).fetchall() == [('http://broken.lan', 4, 100, 102)]
+	assert reliability(con, 0, 365, hits=1).fetchall() == [('http://broken.lan', 5, 100, 300), ('http://flaky.lan', 1, 100, 100)]
+	assert breakdown(con, 'http://broken.lan', 100, 102).fetchall() == [(0, 2, 3600, 5400, 7200), (-2, 2, None, None, None)]
+
+	# Adding the same result again doesn't count it twice
+	log = tmp_path / 'output.log'
+	log.write_text(f'{86400 * 100 + 60},http://broken.lan,-2,"first"\n{86400 * 101},http://broken.lan,-2,"third"\n')
+	assert ingest(con, [str(log)]) == 2
+	assert reliability(con, 100, 102).fetchall() == [('http://broken.lan', 5, 100, 102)]
+
+	# Rolling up an existing database from scratch gives the same
+	con.execute("DELETE FROM daily")
+	con.execute("DELETE FROM daily_state")
+	con.commit()
+	assert rollup(con) == 7
+	assert reliability(con, 100, 102).fetchall() == [('http://broken.lan', 5, 100, 102)]
+	assert breakdown(con, 'http://broken.lan', 100, 102).fetchall() == [(0, 2, 3600, 5400, 7200), (-2, 3, None, None, None)]
+	con.close()
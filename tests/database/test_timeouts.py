@@ -0,0 +1,39 @@
+import pytest
+
+def test_timeouts(tmp_path):
+	from mirrortest.connections import Timing
+	from mirrortest.database import ResultSink, connect, host_timeout, percentiles, timeouts
+
+	path = str(tmp_path / 'results.db')
+
+	with ResultSink(path) as sink:
+		for index in range(20):
+			for url, total in (('http://near.lan', 0.05), ('http://far.lan/archlinux', 2.0 + index / 10), ('http://dead.lan', 60)):
+				sink.probe((1678652796 + index, url, True, 0, [Timing(f"{url}/lastsync", 0, 0, 0, total, total)]))
+
+			# Hedging goes by /lastsync, not by the slowest request of the probe
+			sink.probe((1678652796 + index, 'http://db.lan', True, 0, [Timing('http://db.lan/lastsync', 0, 0, 0, 0.2, 0.2), Timing('http://db.lan/core/os/x86_64/core.db.tar.gz', 0, 0, 0, 0.5, 5.0)]))
+
+		sink.probe((1678652796, 'http://new.lan', True, 0, [Timing('http://new.lan/lastsync', 0, 0, 0, 0.1, 0.1)]))
+		sink.probe((1678652796, 'http://broken.lan', False, -3, []))
+
+		# A host that keeps timing out mustn't learn its own timeout from the failed probes
+		for index in range(20):
+			sink.probe((1678652796 + index, 'http://flaky.lan', index < 5, 0 if index < 5 else -3, [Timing('http://flaky.lan/lastsync', 0, 0, 0, 0.5 if index < 5 else 15.0, 0.5 if index < 5 else 15.0)]))
+
+	con = connect(path)
+	latencies, lastsync = percentiles(con, 0)
+	learned = timeouts(latencies, 1.5, 15.0)
+	recent, _ = percentiles(con, 0, fraction=0, limit=10)
+	con.close()
+
+	# p95 * 2 + 1, clamped between the bounds, and only for hosts with enough history
+	assert learned == {'near.lan': 1.5, 'far.lan': pytest.approx(3.9 * 2 + 1), 'dead.lan': 15.0, 'flaky.lan': 2.0, 'db.lan': 11.0}
+	assert lastsync['db.lan'] == pytest.approx(0.2)
+	assert lastsync['far.lan'] == pytest.approx(3.9)
+	assert 'new.lan' not in lastsync
+	# Only the last `limit` probes of each mirror count
+	assert recent['far.lan'] == pytest.approx(3.0)
+	assert host_timeout(learned, 'https://far.lan/somewhere/else') == learned['far.lan']
+	assert host_timeout(learned, 'http://new.lan') is None
+	assert host_timeout(None, 'http://new.lan') is None
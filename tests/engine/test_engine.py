@@ -0,0 +1,146 @@
+import pytest
+import asyncio
+
+def test_engine_scan(local_mirror, local_tier0):
+	from mirrortest.engine import scan
+
+	results = {}
+	requests = {}
+
+	def callback(url, good_exit, time_delta_int, time_delta_str, timings, times):
+		results[url] = (good_exit, time_delta_int)
+		requests[url] = sorted(timing.url for timing in timings)
+
+	asyncio.run(scan([local_mirror, f"{local_mirror}/redirect", f"{local_mirror}/missing", "http://127.0.0.1:1"], local_tier0, 2, callback))
+
+	assert results[local_mirror] == (True, 0)
+	assert results[f"{local_mirror}/redirect"] == (True, 0)
+	assert results[f"{local_mirror}/missing"] == (False, -1)
+	assert results["http://127.0.0.1:1"] == (False, -2)
+	assert requests[local_mirror] == [f"{local_mirror}/lastsync", f"{local_mirror}/lastupdate"]
+	# Failed requests are recorded as well, the other one is cancelled if it hasn't failed yet
+	assert requests["http://127.0.0.1:1"] and set(requests["http://127.0.0.1:1"]) <= {"http://127.0.0.1:1/lastsync", "http://127.0.0.1:1/lastupdate"}
+
+def test_engine_deadline(local_mirror, local_tier0):
+	import socket
+	import time
+	from mirrortest.engine import scan
+
+	# Accepts connections, but never answers
+	stalled = socket.create_server(('127.0.0.1', 0))
+	url = f"http://127.0.0.1:{stalled.getsockname()[1]}"
+	results = {}
+
+	def callback(url, good_exit, time_delta_int, time_delta_str, timings, times):
+		results[url] = (good_exit, time_delta_int)
+
+	started = time.monotonic()
+	asyncio.run(scan([local_mirror, url], local_tier0, 2, callback, hedges={'127.0.0.1': 0.05}, deadline=time.monotonic() + 0.5))
+
+	assert time.monotonic() - started < 1
+	assert results == {local_mirror: (True, 0), url: (False, -8)}
+	stalled.close()
+
+def test_engine_mirrorlist(local_mirror, local_tier0):
+	import time
+	import urllib.error
+	from mirrortest.engine import scan
+
+	results = {}
+
+	def callback(url, good_exit, time_delta_int, time_delta_str, timings, times):
+		results[url] = (good_exit, time_delta_int)
+
+	def broken():
+		yield local_mirror
+		raise urllib.error.URLError("mirrorlist cut short")
+
+	# The mirrors listed before the mirrorlist broke off are still tested
+	with pytest.raises(urllib.error.URLError):
+		asyncio.run(scan(broken(), local_tier0, 2, callback))
+	assert results == {local_mirror: (True, 0)}
+
+	def slow():
+		yield local_mirror
+		time.sleep(0.5)
+		yield f"{local_mirror}/missing"
+
+	# Only what comes in before the deadline is tested
+	results.clear()
+	started = time.monotonic()
+	asyncio.run(scan(slow(), local_tier0, 2, callback, deadline=time.monotonic() + 0.25))
+	assert time.monotonic() - started < 0.5
+	assert results == {local_mirror: (True, 0)}
+
+def test_engine_bad_status_line():
+	import socket
+	import threading
+	import urllib.error
+	from mirrortest.engine import request
+
+	server = socket.create_server(('127.0.0.1', 0))
+
+	def serve():
+		for response in (b'HTTP/1.1 OK\r\n\r\n', b'SSH-2.0-OpenSSH_9.3\r\n\r\n'):
+			client, _ = server.accept()
+			client.recv(65536)
+			client.sendall(response)
+			client.close()
+
+	threading.Thread(target=serve, daemon=True).start()
+
+	# A garbled status line or another protocol fails the mirror
+	for _ in range(2):
+		with pytest.raises(urllib.error.URLError):
+			asyncio.run(request(f"http://127.0.0.1:{server.getsockname()[1]}/lastsync", 5))
+
+	server.close()
+
+def test_engine_keep_alive(local_mirror, local_tier0):
+	from mirrortest.engine import scan
+
+	timings = {}
+
+	def callback(url, good_exit, time_delta_int, time_delta_str, timing, times):
+		timings[url] = timing
+
+	asyncio.run(scan([local_mirror, f"{local_mirror}/redirect"], local_tier0, 1, callback))
+
+	# The mirror after it on the same host, and the redirect, reuse the connections of the first one
+	assert all(timing.connect > 0 for timing in timings[local_mirror])
+	assert len(timings[f"{local_mirror}/redirect"]) == 2
+	assert all(timing.dns == timing.connect == 0 for timing in timings[f"{local_mirror}/redirect"])
+
+def test_engine_keep_alive_hung_up():
+	import socket
+	import threading
+	from mirrortest.engine import Connections, pooled, request
+
+	server = socket.create_server(('127.0.0.1', 0))
+
+	def serve():
+		client, _ = server.accept()
+		client.recv(65536)
+		client.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\none')
+		# Hangs up on the next request, as a server whose keep-alive timeout just ran out would
+		client.recv(65536)
+		client.close()
+
+		client, _ = server.accept()
+		client.recv(65536)
+		client.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 3\r\nConnection: close\r\n\r\ntwo')
+		client.close()
+
+	threading.Thread(target=serve, daemon=True).start()
+
+	async def twice():
+		connections = Connections()
+		pooled.set(connections)
+		bodies = [await request(f"http://127.0.0.1:{server.getsockname()[1]}/lastsync", 5) for _ in range(2)]
+		# Connection: close isn't kept
+		assert connections.idle_count == 0
+		return bodies
+
+	# The request is made again over a new connection
+	assert asyncio.run(twice()) == [b'one', b'two']
+	server.close()
@@ -0,0 +1,94 @@
+import pytest
+import functools
+
+def test_pool(local_mirror, local_tier0):
+	from mirrortest.models import MirrorTester
+	from mirrortest.pool import MirrorTesterPool
+
+	urls = [local_mirror, f"{local_mirror}/missing", "http://127.0.0.1:1"]
+
+	with MirrorTesterPool(2) as pool:
+		for url in urls:
+			pool.submit(functools.partial(MirrorTester, tier=2, url=url, tier_0=local_tier0))
+
+		results = {url: (good_exit, time_delta_int) for url, good_exit, time_delta_int, time_delta_str, timings, times in pool.results()}
+
+	assert pool.pending == 0
+	assert results[local_mirror] == (True, 0)
+	assert results[f"{local_mirror}/missing"] == (False, -1)
+	assert results["http://127.0.0.1:1"] == (False, -2)
+
+def test_pool_crashed(local_mirror, local_tier0):
+	from mirrortest.models import MirrorTester
+	from mirrortest.pool import MirrorTesterPool
+	from mirrortest.results import CRASHED_CODE
+
+	def broken(url):
+		raise RuntimeError("not a mirror problem")
+
+	with MirrorTesterPool(2) as pool:
+		pool.submit(functools.partial(broken, url='http://broken.lan'))
+		pool.submit(functools.partial(MirrorTester, tier=2, url=local_mirror, tier_0=local_tier0))
+
+		results = {url: (good_exit, time_delta_int, time_delta_str) for url, good_exit, time_delta_int, time_delta_str, timings, times in pool.results()}
+
+	# One mirror crashing doesn't take the others with it
+	assert results == {'http://broken.lan': (False, CRASHED_CODE, "RuntimeError: not a mirror problem"), local_mirror: (True, 0, results[local_mirror][2])}
+
+def test_pool_per_host():
+	import threading
+	import time
+	from mirrortest.pool import MirrorTesterPool
+
+	lock = threading.Lock()
+	running = {}
+	most = {}
+
+	class Mirror:
+		valid = True
+		last_sync = None
+		last_update = None
+		packages_behind = None
+
+		def __init__(self, url):
+			host = url.split('/')[2]
+			with lock:
+				running[host] = running.get(host, 0) + 1
+				most[host] = max(most.get(host, 0), running[host])
+			time.sleep(0.02)
+			with lock:
+				running[host] -= 1
+
+	urls = [f"http://a.lan/{path}" for path in range(6)] + [f"https://a.lan/{path}" for path in range(2)] + [f"http://{host}.lan" for host in 'bcdef']
+
+	with MirrorTesterPool(8, per_host=2) as pool:
+		for url in urls:
+			pool.submit(functools.partial(Mirror, url=url))
+
+		assert sorted(url for url, *result in pool.results()) == sorted(urls)
+
+	# Over http or https, it's the same host
+	assert most['a.lan'] == 2
+	assert not pool.running and not pool.waiting
+
+def test_pool_deadline(local_mirror, local_tier0):
+	import socket
+	import time
+	from mirrortest.pool import MirrorTesterPool
+	from mirrortest.records import MirrorRecord
+
+	# Accepts connections, but never answers
+	stalled = socket.create_server(('127.0.0.1', 0))
+	url = f"http://127.0.0.1:{stalled.getsockname()[1]}"
+
+	with MirrorTesterPool(2) as pool:
+		for mirror in (local_mirror, url):
+			pool.submit(functools.partial(MirrorRecord.fetch, tier=2, url=mirror, tier_0=local_tier0))
+
+		started = time.monotonic()
+		assert [url for url, *result in pool.results(time.monotonic() + 0.5)] == [local_mirror]
+		assert pool.cancel() == [url]
+		assert list(pool.results()) == []
+
+	assert time.monotonic() - started < 1
+	stalled.close()
@@ -0,0 +1,49 @@
+import pytest
+import threading
+
+def test_scheduler():
+	from mirrortest.scheduler import Scheduler
+
+	now = [0.0]
+	scheduler = Scheduler(drift=100, min_interval=10, max_interval=40, clock=lambda: now[0])
+
+	scheduler.update(['http://stable.lan', 'http://broken.lan'])
+	assert sorted(scheduler.due()) == ['http://broken.lan', 'http://stable.lan']
+	# Nothing is due twice while it's being tested
+	assert list(scheduler.due()) == []
+
+	for _ in range(3):
+		scheduler.done('http://stable.lan', True, 0)
+		scheduler.done('http://broken.lan', False, -2)
+		assert scheduler.intervals['http://broken.lan'] == 10
+
+		now[0] += 11
+		assert list(scheduler.due()) == ['http://broken.lan']
+
+		now[0] = max(due for due, url in scheduler.queue)
+		assert list(scheduler.due()) == ['http://stable.lan']
+
+	# Stable mirrors back off up until max_interval, drifting ones start over
+	assert scheduler.intervals['http://stable.lan'] == 40
+	scheduler.done('http://stable.lan', True, 500)
+	assert scheduler.intervals['http://stable.lan'] == 10
+
+	scheduler.update(['http://stable.lan'])
+	scheduler.done('http://broken.lan', False, -2)
+	now[0] += 1000
+	assert list(scheduler.due()) == ['http://stable.lan']
+
+def test_serve(local_mirror, local_tier0):
+	from mirrortest.scheduler import serve
+
+	stop = threading.Event()
+	results = {}
+
+	def callback(url, good_exit, time_delta_int, time_delta_str, timings, times):
+		results[url] = (good_exit, time_delta_int)
+		if len(results) == 2:
+			stop.set()
+
+	serve(local_tier0, 2, callback, lambda: [local_mirror, f"{local_mirror}/missing"], stop=stop)
+
+	assert results == {local_mirror: (True, 0), f"{local_mirror}/missing": (False, -1)}
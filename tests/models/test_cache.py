@@ -0,0 +1,43 @@
+import pytest
+
+def test_cache(local_server, tmp_path):
+	from mirrortest.cache import HTTPCache
+
+	cache = HTTPCache(tmp_path)
+
+	lastsync = cache.request(f"{local_server.url}/lastsync", 5, 60)
+	assert local_server.hits == 1
+
+	# Within the TTL nothing should be requested
+	assert cache.request(f"{local_server.url}/lastsync", 5, 60) == lastsync
+	assert local_server.hits == 1
+
+	# Past the TTL the ETag should get us a 304 and the cached body
+	assert cache.request(f"{local_server.url}/lastsync", 5, 0) == lastsync
+	assert local_server.hits == 2
+
+	entry, body = cache.load(f"{local_server.url}/lastsync")
+	assert entry['etag'] is not None
+	assert body == lastsync
+
+def test_cache_stream(local_server, tmp_path):
+	from mirrortest.cache import HTTPCache
+
+	cache = HTTPCache(tmp_path)
+	url = f"{local_server.url}/lastsync"
+
+	# A stream that's abandoned half way isn't cached
+	lines = cache.stream(url, 5, 60)
+	next(lines)
+	lines.close()
+	assert cache.load(url) == (None, None)
+
+	lastsync = b''.join(cache.stream(url, 5, 60))
+	assert local_server.hits == 2
+	assert cache.load(url)[1] == lastsync
+
+	# Within the TTL nothing should be requested, past it we should get a 304 and the cached lines
+	assert b''.join(cache.stream(url, 5, 60)) == lastsync
+	assert local_server.hits == 2
+	assert b''.join(cache.stream(url, 5, 0)) == lastsync
+	assert local_server.hits == 3
@@ -7,7 +7,12 @@ def test_configuration():
 	assert default_values.MAX_TIER1_SYNC_DRIFT_SEC == 3600 * 2
 	assert default_values.MAX_TIER2_SYNC_DRIFT_SEC == 3600 * 6
 	assert default_values.CON_TIMEOUT == 5
+	assert default_values.CACHE_TTL == 60
 	assert default_values.DEFAULT_TIER_NR == 2
+	assert default_values.MIRRORLIST == "https://archlinux.org/mirrorlist/all/"
+	assert default_values.CON_TIMEOUT_MIN == 1.0
+	assert default_values.CON_TIMEOUT_MAX == 15.0
+	assert default_values.MAX_PER_HOST == 1
 	assert default_values.USERNAME is None
 	assert default_values.PASSWORD is None
 	assert default_values.email == False
@@ -0,0 +1,131 @@
+import pytest
+import urllib.error
+
+def test_connection_pool(local_mirror):
+	from mirrortest.connections import ConnectionPool
+
+	pool = ConnectionPool()
+
+	_, lastsync = pool.request(f"{local_mirror}/lastsync", 5)
+	connection = pool.idle[('http', '127.0.0.1', int(local_mirror.rsplit(':', 1)[1]))][0]
+
+	# The second request (and the redirect) should reuse the same keep-alive connection
+	_, lastupdate = pool.request(f"{local_mirror}/redirect/lastupdate", 5)
+	assert lastsync == lastupdate
+	assert pool.idle_count == 1
+	assert pool.idle[('http', '127.0.0.1', int(local_mirror.rsplit(':', 1)[1]))][0] is connection
+
+	with pytest.raises(urllib.error.HTTPError):
+		pool.request(f"{local_mirror}/missing", 5)
+
+	with pytest.raises(urllib.error.URLError):
+		pool.request("http://127.0.0.1:1/lastsync", 5)
+
+	pool.close()
+	assert pool.idle_count == 0
+
+def test_connection_pool_truncated():
+	import socket
+	import threading
+	from mirrortest.connections import ConnectionPool, trace
+
+	# Promises 100 bytes, but hangs up after 10
+	server = socket.create_server(('127.0.0.1', 0))
+
+	def serve():
+		for _ in range(2):
+			client, _ = server.accept()
+			client.recv(65536)
+			client.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n0123456789')
+			client.close()
+
+	threading.Thread(target=serve, daemon=True).start()
+	url = f"http://127.0.0.1:{server.getsockname()[1]}/lastsync"
+	pool = ConnectionPool()
+
+	with trace() as timings:
+		with pytest.raises(urllib.error.URLError):
+			pool.request(url, 5)
+
+		with pytest.raises(urllib.error.URLError):
+			with pool.stream(url, 5) as response:
+				response.read()
+
+	# Failed requests are timed as far as they got
+	assert [timing.url for timing in timings] == [url, url]
+	assert all(timing.ttfb > 0 and timing.total >= timing.ttfb for timing in timings)
+
+	server.close()
+
+def test_gather():
+	import time
+	from mirrortest.connections import gather
+
+	started = time.monotonic()
+	assert gather(lambda: time.sleep(0.2) or 1, lambda: time.sleep(0.2) or 2, timeout=1) == [1, 2]
+	assert time.monotonic() - started < 0.4
+
+	with pytest.raises(TimeoutError):
+		gather(lambda: 1, lambda: time.sleep(1), timeout=0.1)
+
+def test_hedged():
+	import itertools
+	import time
+	from mirrortest.connections import hedged
+
+	calls = itertools.count()
+
+	# Only the first call stalls, the second one sent after the delay answers first
+	started = time.monotonic()
+	assert hedged(lambda: time.sleep(1) or 'first' if next(calls) == 0 else 'second', 0.05) == 'second'
+	assert time.monotonic() - started < 0.5
+
+	# A call that answers in time isn't sent again
+	assert hedged(lambda: next(calls), 1) == 2
+	assert next(calls) == 3
+
+def test_hedged_hang_up():
+	import functools
+	import socket
+	import threading
+	from mirrortest.connections import ConnectionPool, hedged, trace
+
+	# Never answers the first request, answers the second one right away
+	server = socket.create_server(('127.0.0.1', 0))
+	hung_up = threading.Event()
+
+	def serve():
+		stalled, _ = server.accept()
+		stalled.recv(65536)
+		client, _ = server.accept()
+		client.recv(65536)
+		client.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 6\r\n\r\nsecond')
+		client.close()
+
+		stalled.settimeout(5)
+		if stalled.recv(65536) == b'':
+			hung_up.set()
+		stalled.close()
+
+	threading.Thread(target=serve, daemon=True).start()
+	url = f"http://127.0.0.1:{server.getsockname()[1]}/lastsync"
+	pool = ConnectionPool()
+
+	with trace() as timings:
+		_, body = hedged(functools.partial(pool.request, url, 5), 0.05)
+
+	# The losing request is hung up on and left out of the trace
+	assert body == b'second'
+	assert hung_up.wait(1)
+	assert len(timings) == 1
+
+	pool.close()
+	server.close()
+
+def test_mirror_tester_local(local_mirror, local_tier0):
+	from mirrortest.models import MirrorTester
+
+	mirror = MirrorTester(url=local_mirror, tier=2, tier_0=local_tier0)
+	assert mirror.last_sync is not None
+	assert mirror.last_update == local_tier0.last_update
+	assert mirror.valid == True
@@ -0,0 +1,23 @@
+import pytest
+import functools
+
+def test_mirror_record(local_mirror, local_tier0):
+	from mirrortest.records import MirrorRecord
+	from mirrortest.results import evaluate
+
+	# Constructing a record does no requests
+	record = MirrorRecord(url=f"{local_mirror}/", tier=2, tier_0=local_tier0, last_sync=local_tier0.last_sync, last_update=b'')
+	assert record.url == local_mirror
+	assert record.last_update is None
+	assert not hasattr(record, '__dict__')
+
+	fetched = MirrorRecord.fetch(url=local_mirror, tier=2, tier_0=local_tier0)
+	assert fetched.last_update == local_tier0.last_update
+	assert fetched.valid == True
+
+	assert evaluate(functools.partial(MirrorRecord.fetch, url=local_mirror, tier=2, tier_0=local_tier0))[:2] == (True, 0)
+	assert evaluate(functools.partial(MirrorRecord.fetch, url=f"{local_mirror}/missing", tier=2, tier_0=local_tier0))[:2] == (False, -1)
+	# An unparsable /lastupdate is -4, like the pydantic.ValidationError of a MirrorTester
+	assert evaluate(functools.partial(MirrorRecord, url=local_mirror, tier=2, tier_0=local_tier0, last_sync=b'0', last_update=b'garbage'))[:2] == (False, -4)
+	assert evaluate(functools.partial(MirrorRecord, url=local_mirror, tier=2, tier_0=local_tier0, last_sync=b'0', last_update=b'9' * 30))[:2] == (False, -4)
+	assert evaluate(functools.partial(MirrorRecord, url=local_mirror, tier=2, tier_0=local_tier0, last_sync=b'0', last_update=b'-99999999999'))[:2] == (False, -4)
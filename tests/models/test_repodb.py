@@ -0,0 +1,120 @@
+import pytest
+import conftest
+
+def test_digest(local_server):
+	import hashlib
+	from mirrortest.connections import pool
+	from mirrortest.repodb import digest, spool
+
+	database = conftest.make_db({f"package{index}": f"1.{index}-1" for index in range(2000)})
+	conftest.LocalMirror.databases['/core/os/x86_64/core.db.tar.gz'] = database
+
+	with spool() as fh:
+		assert digest(pool.stream(f"{local_server.url}/core/os/x86_64/core.db.tar.gz", 5), spool=fh) == (hashlib.sha256(database).hexdigest(), len(database))
+
+		fh.seek(0)
+		assert fh.read() == database
+
+def test_package_index():
+	import io
+	from mirrortest.repodb import PackageIndex
+
+	tier0 = PackageIndex.from_file(io.BytesIO(conftest.make_db({'linux': '6.2-1', 'pacman': '6.0.2-6', 'zstd': '1.5.4-1'})))
+	mirror = PackageIndex.from_file(io.BytesIO(conftest.make_db({'linux': '6.1-1', 'zstd': '1.5.4-1', 'removed': '1-1'})))
+
+	assert len(tier0) == 3
+	assert tier0.names == ['linux', 'pacman', 'zstd']
+	assert mirror.diff(tier0) == (1, 1)
+	assert tier0.diff(tier0) == (0, 0)
+
+def test_compare(local_mirror, local_tier0):
+	from mirrortest.models import MirrorTester
+	from mirrortest.repodb import Tier0Index, compare
+
+	conftest.LocalMirror.databases['/core/os/x86_64/core.db.tar.gz'] = conftest.make_db({'linux': '6.2-1', 'pacman': '6.0.2-6'})
+	conftest.LocalMirror.databases['/behind/core/os/x86_64/core.db.tar.gz'] = conftest.make_db({'linux': '6.1-1'})
+
+	# The local mirror stands in as the Tier0, as only stream_db() is needed
+	tier0_index = Tier0Index(MirrorTester(url=local_mirror, tier=1, tier_0=local_tier0))
+
+	assert compare(MirrorTester(url=local_mirror, tier=2, tier_0=local_tier0), 'core', tier0_index) == (0, 0)
+	assert compare(MirrorTester(url=f"{local_mirror}/behind", tier=2, tier_0=local_tier0, last_sync=None, last_update=None), 'core', tier0_index) == (1, 1)
+
+def test_unchanged(local_server, local_tier0):
+	from mirrortest.models import MirrorTester
+	from mirrortest.repodb import Tier0Index, unchanged, agrees
+
+	assert agrees(('10', 'Mon, 13 Mar 2023 10:00:00 GMT', None), ('10', 'Mon, 13 Mar 2023 10:00:00 GMT', '"abc"'))
+	assert not agrees(('10', 'Mon, 13 Mar 2023 10:00:00 GMT', None), ('11', 'Mon, 13 Mar 2023 10:00:00 GMT', None))
+	assert not agrees(('10', None, None), ('10', None, None))
+	assert not agrees(None, ('10', None, None))
+
+	conftest.LocalMirror.databases['/tier0/core/os/x86_64/core.db.tar.gz'] = conftest.make_db({'linux': '6.2-1'})
+	conftest.LocalMirror.databases['/tier0/extra/os/x86_64/extra.db.tar.gz'] = conftest.make_db({'vim': '9.0-1'})
+	conftest.LocalMirror.databases['/mirror/core/os/x86_64/core.db.tar.gz'] = conftest.make_db({'linux': '6.2-1'})
+	conftest.LocalMirror.databases['/mirror/extra/os/x86_64/extra.db.tar.gz'] = conftest.make_db({'vim': '9.0-1', 'emacs': '29.1-1'})
+
+	tier0_index = Tier0Index(MirrorTester(url=f"{local_server.url}/tier0", tier=1, tier_0=local_tier0, last_sync=None, last_update=None))
+	mirror = MirrorTester(url=f"{local_server.url}/mirror", tier=2, tier_0=local_tier0, last_sync=None, last_update=None)
+
+	# Only HEAD requests, and a missing multilib.db is simply not agreeing
+	assert unchanged(mirror, tier0_index) == {'core'}
+	assert local_server.hits == 0
+
+def test_compare_unreadable(local_server, local_tier0):
+	from mirrortest.models import MirrorTester
+	from mirrortest.repodb import Tier0Index, compare
+	from mirrortest.results import DatabaseError, Tier0DatabaseError, error_code
+
+	database = conftest.make_db({'linux': '6.2-1'})
+	conftest.LocalMirror.databases['/tier0/core/os/x86_64/core.db.tar.gz'] = database
+	conftest.LocalMirror.databases['/html/core/os/x86_64/core.db.tar.gz'] = b'<html><body>Not Found</body></html>'
+	conftest.LocalMirror.databases['/cut/core/os/x86_64/core.db.tar.gz'] = database[:len(database) // 2]
+	conftest.LocalMirror.databases['/tier0/extra/os/x86_64/extra.db.tar.gz'] = b'<html><body>Not Found</body></html>'
+
+	tier0_index = Tier0Index(MirrorTester(url=f"{local_server.url}/tier0", tier=1, tier_0=local_tier0, last_sync=None, last_update=None))
+
+	for path in ('html', 'cut'):
+		with pytest.raises(DatabaseError) as error:
+			compare(MirrorTester(url=f"{local_server.url}/{path}", tier=2, tier_0=local_tier0, last_sync=None, last_update=None), 'core', tier0_index)
+		assert error_code(error.value) == -10
+
+	# A broken Tier0 database is fetched once and blamed on the Tier0 for every mirror
+	hits = local_server.hits
+	for path in ('html', 'cut'):
+		with pytest.raises(Tier0DatabaseError, match='Tier0'):
+			compare(MirrorTester(url=f"{local_server.url}/{path}", tier=2, tier_0=local_tier0, last_sync=None, last_update=None), 'extra', tier0_index)
+	assert local_server.hits == hits + 1
+
+def test_tier0_index_locks():
+	import contextlib
+	import io
+	import threading
+	from mirrortest.repodb import Tier0Index
+
+	fetching = threading.Event()
+	release = threading.Event()
+
+	class SlowTier0:
+		def stream_db(self, repo):
+			if repo == 'core':
+				fetching.set()
+				release.wait(5)
+			return contextlib.nullcontext(io.BytesIO(conftest.make_db({'linux': '6.2-1'})))
+
+		def head_db(self, repo):
+			return {'Content-Length': '10'}
+
+	tier0_index = Tier0Index(SlowTier0())
+	fetch = threading.Thread(target=tier0_index.__getitem__, args=('core',))
+	fetch.start()
+	fetching.wait(5)
+
+	# A database being fetched holds up neither another one nor the metadata
+	assert len(tier0_index['extra'][1]) == 1
+	assert tier0_index.head('core') == ('10', None, None)
+	assert fetch.is_alive()
+
+	release.set()
+	fetch.join()
+	assert len(tier0_index['core'][1]) == 1
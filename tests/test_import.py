@@ -1,4 +1,15 @@
 import pytest
 
 def test_import():
-	import mirrortest
\ No newline at end of file
+	import mirrortest
+
+def test_import_cli():
+	import subprocess
+	import sys
+
+	# Importing the CLI must neither parse sys.argv nor load the configuration (and with it pydantic)
+	subprocess.run([sys.executable, '-c', (
+		"import sys; sys.argv += ['--help']; "
+		"import mirrortest.tooling.cli; "
+		"assert 'pydantic' not in sys.modules and 'mirrortest.session' not in sys.modules and 'mirrortest.mailhandle' not in sys.modules"
+	)], check=True)